@@ -21,7 +21,8 @@ import gettext
 import json
 import uuid
 import itertools
-import urllib
+from collections import OrderedDict
+from urllib.parse import unquote_to_bytes
 
 import gi
 from gi.repository import Gtk
@@ -33,10 +34,9 @@ from gi.repository import Pango
 from idjc import *
 from .playergui import *
 from .prelims import *
-from .gtkstuff import LEDDict
 from .gtkstuff import WindowSizeTracker
 from .gtkstuff import DefaultEntry
-from .gtkstuff import timeout_add, source_remove
+from .gtkstuff import timeout_add, idle_add, source_remove
 from .tooltips import set_tip
 from .utils import LinkUUIDRegistry
 
@@ -46,9 +46,6 @@ _ = gettext.translation(FGlobs.package_name, FGlobs.localedir,
 PM = ProfileManager()
 link_uuid_reg = LinkUUIDRegistry()
 
-# Pixbufs for LED's of the specified size.
-LED = LEDDict(9)
-
 
 class Effect(Gtk.Grid):
     """A trigger button for an audio effect or jingle.
@@ -59,6 +56,19 @@ class Effect(Gtk.Grid):
 
     CONFIG_TARGET = Gdk.Atom.intern('application/x-idjc-effect', False)
 
+    # (modification time, media metadata) keyed by pathname and request
+    # type, least recently used first. Room for both requests of every
+    # effect.
+    _metadata_cache = OrderedDict()
+    _metadata_cache_size = PGlobs.num_effects * 2
+
+    # Effects showing progress, all updated from the one timeout.
+    _playing = set()
+    _progress_source_id = None
+
+    # Drag and drop target lists of the config button, shared by all effects.
+    _target_lists = None
+
     def __init__(self, num, others, parent):
         self.num = num
         self.others = others
@@ -95,6 +105,7 @@ class Effect(Gtk.Grid):
 
         self.trigger_label = Gtk.Label()
         self.trigger_label.set_ellipsize(Pango.EllipsizeMode.END)
+        self.trigger_label.set_use_markup(True)
 
         trigger_label_box = Gtk.HBox()
         trigger_label_box.set_spacing(3)
@@ -124,28 +135,21 @@ class Effect(Gtk.Grid):
         self.config.add(self.config_image)
         self.attach_next_to(self.config, self.repeat, Gtk.PositionType.RIGHT, 2, 1)
         self.config.connect("clicked", self._on_config)
+        source_targets, dest_targets = self._get_target_lists()
         self.config.drag_source_set(Gdk.ModifierType.BUTTON1_MASK, None, Gdk.DragAction.COPY)
-        target_list = Gtk.TargetList()
-        target_list.add(self.CONFIG_TARGET, Gtk.TargetFlags.SAME_APP, 1)
-        self.config.drag_source_set_target_list(target_list)
+        self.config.drag_source_set_target_list(source_targets)
 
         self.config.connect("drag-begin", self._drag_begin)
         self.config.connect("drag-data-get", self._drag_get_data)
         set_tip(self.config, _('Configure'))
         self.config.drag_dest_set(Gtk.DestDefaults.ALL, None, Gdk.DragAction.COPY)
-        target_list = Gtk.TargetList()
-        target_list.add_uri_targets(0)
-        target_list.add_text_targets(0)
-        target_list.add(self.CONFIG_TARGET, Gtk.TargetFlags.SAME_APP, 1)
-        self.config.drag_dest_set_target_list(target_list)
+        self.config.drag_dest_set_target_list(dest_targets)
         self.config.connect("drag-data-received", self._drag_data_received)
 
-        self.dialog = EffectConfigDialog(self, parent.window)
-        self.dialog.connect("response", self._on_dialog_response)
-        self.dialog.emit("response", Gtk.ResponseType.NO)
-        self.timeout_source_id = None
-        self.interlude = IDJC_Media_Player(None, None, parent)
-        self.effect_length = 0.0
+        # The config dialog and metadata reader are made on first use.
+        self._dialog = None
+        self._interlude = None
+        self._clear_config()
         # Create the widget that will be used in the tab
         self.tabwidget = Gtk.HBox()
         self.tabwidget.set_spacing(3)
@@ -165,6 +169,31 @@ class Effect(Gtk.Grid):
         vb.pack_start(self.tabeffectprog)
         self.tabwidget.show_all()
 
+    @classmethod
+    def _get_target_lists(cls):
+        if cls._target_lists is None:
+            source_targets = Gtk.TargetList()
+            source_targets.add(cls.CONFIG_TARGET, Gtk.TargetFlags.SAME_APP, 1)
+            dest_targets = Gtk.TargetList()
+            dest_targets.add_uri_targets(0)
+            dest_targets.add_text_targets(0)
+            dest_targets.add(cls.CONFIG_TARGET, Gtk.TargetFlags.SAME_APP, 1)
+            cls._target_lists = source_targets, dest_targets
+        return cls._target_lists
+
+    @property
+    def dialog(self):
+        if self._dialog is None:
+            self._dialog = EffectConfigDialog(self, self.approot.window)
+            self._dialog.connect("response", self._on_dialog_response)
+        return self._dialog
+
+    @property
+    def interlude(self):
+        if self._interlude is None:
+            self._interlude = IDJC_Media_Player(None, None, self.approot)
+        return self._interlude
+
     def _drag_begin(self, widget, context):
         widget.drag_source_set_icon_name("media-tape-symbolic")
 
@@ -176,21 +205,50 @@ class Effect(Gtk.Grid):
         if info == 1:
             other = self.others[dragged.get_data()[0]]
             if other != self:
-                self.stop.clicked()
-                other.stop.clicked()
+                self._stop_effect()
+                other._stop_effect()
                 self._swap(other)
                 return True
         else:
-            data = dragged.get_data().splitlines()
-            if len(data) == 1 and data[0].startswith(b"file://"):
-                pathname = urllib.request.unquote(data[0][7:].decode('utf-8'))
-                title = self.interlude.get_media_metadata(pathname).title
+            # Only a lone file:// URI is accepted.
+            uri = dragged.get_data().rstrip(b"\r\n")
+            if uri.startswith(b"file://") and b"\n" not in uri \
+                                                    and b"\r" not in uri:
+                pathname = os.fsdecode(unquote_to_bytes(uri[7:]))
+                title = self._get_media_metadata(pathname).title
                 if title:
-                    self.stop.clicked()
+                    self._stop_effect()
                     self._set(pathname, title, 0.0)
                     return True
         return False
 
+    def _get_media_metadata(self, pathname, get_length=False):
+        """Cached get_media_metadata, read again when the file is modified."""
+
+        try:
+            mtime = os.path.getmtime(pathname)
+        except OSError:
+            return self.interlude.get_media_metadata(pathname, get_length)
+
+        cache = self._metadata_cache
+        key = (pathname, get_length)
+        try:
+            cached_mtime, meta = cache[key]
+        except KeyError:
+            pass
+        else:
+            if cached_mtime == mtime:
+                cache.move_to_end(key)
+                return meta
+
+        meta = self.interlude.get_media_metadata(pathname, get_length)
+        # A stale entry for the same file is replaced rather than added to.
+        cache[key] = (mtime, meta)
+        cache.move_to_end(key)
+        if len(cache) > self._metadata_cache_size:
+            cache.popitem(last=False)
+        return meta
+
     def _swap(self, other):
         new_pathname = other.pathname
         new_text = other.trigger_label.get_text() or ""
@@ -202,117 +260,146 @@ class Effect(Gtk.Grid):
         self._set(new_pathname, new_text, new_level, new_sensitive)
 
     def _set(self, pathname, button_text, level, sensitive=True):
-        if pathname is None:
-            self.dialog.set_current_folder(os.path.expanduser("~"))
+        if sensitive:
+            self._apply_config(pathname, button_text, level,
+                                                new_uuid=pathname is not None)
         else:
-            try:
-                self.dialog.set_filename(pathname)
-            except:
-                self.dialog.set_current_folder(os.path.expanduser("~"))
-
-        self.dialog.button_entry.set_text(button_text)
-        self.dialog.gain_adj.set_value(level)
-        self._on_dialog_response(self.dialog,
-                                 Gtk.ResponseType.ACCEPT
-                                 if sensitive else
-                                 Gtk.ResponseType.NO,
-                                 pathname)
+            self._clear_config()
 
     def _on_config(self, widget):
-        self.stop.clicked()
+        self._stop_effect()
+        dialog = self.dialog
         if self.pathname and os.path.isfile(self.pathname):
-            self.dialog.select_filename(self.pathname)
-        self.dialog.button_entry.set_text(self.trigger_label.get_text() or "")
-        self.dialog.gain_adj.set_value(self.level)
-        self.dialog.show()
+            dialog.set_filename(self.pathname)
+        else:
+            dialog.unselect_all()
+            dialog.set_current_folder(os.path.expanduser("~"))
+        dialog.button_entry.set_text(self.trigger_label.get_text() or "")
+        dialog.gain_adj.set_value(self.level)
+        dialog.show()
 
     def _on_trigger(self, widget):
         if self.trigger.get_sensitive():
             self._repeat_works = True
             if self.pathname:
-                if not self.timeout_source_id:
+                # Start the sound before doing any of the UI work.
+                self.approot.mixer_write(
+                    "EFCT={}\nPLRP={}\n"
+                    "RGDB={}\nACTN=playeffect\nend\n".format(self.num, self.pathname, self.level))
+                self.effect_start = time.monotonic()
+                if self not in self._playing:
                     if self.effect_length == 0.0:
-                        self.effect_length = self.interlude.get_media_metadata(self.pathname, True)
-                    self.effect_start = time.time()
-                    self.timeout_source_id = timeout_add(playergui.PROGRESS_TIMEOUT,
-                                    self._progress_timeout)
+                        idle_add(self._read_length, self.pathname)
+                    self._start_progress()
                     self.tabeffectname.set_text(self.trigger_label.get_text())
                     self.tabeffecttime.set_text('0.0')
                     self.tabeffectprog.set_fraction(0.0)
                     self.approot.jingles.nb_effects_box.add(self.tabwidget)
                     self.approot.effect_started(self.trigger_label.get_text(),
                                                 self.pathname, self.num)
-                else: # Restarted the effect
-                    self.effect_start = time.time()
-                self.approot.mixer_write(
-                    "EFCT={}\nPLRP={}\n"
-                    "RGDB={}\nACTN=playeffect\nend\n".format(self.num, self.pathname, self.level))
+
+    def _read_length(self, pathname):
+        # Progress is shown once this is known.
+        if pathname == self.pathname:
+            self.effect_length = self._get_media_metadata(pathname, True)
+            self._inverse_length = 1.0 / self.effect_length \
+                                                if self.effect_length else 0.0
 
     def _on_stop(self, widget):
+        self._stop_effect()
+
+    def _stop_effect(self):
         self._repeat_works = False
         self.approot.mixer_write("EFCT={}\nACTN=stopeffect\nend\n".format(self.num))
 
-    def _progress_timeout(self):
-        now = time.time()
-        played = now - self.effect_start
-        try:
-            ratio = min(played / self.effect_length, 1.0)
-        except ZeroDivisionError:
-            pass
-        else:
+    def _start_progress(self):
+        if not self._playing:
+            Effect._progress_source_id = timeout_add(
+                        playergui.PROGRESS_TIMEOUT, Effect._progress_timeout)
+        self._playing.add(self)
+
+    @classmethod
+    def _progress_timeout(cls):
+        now = time.monotonic()
+        for each in cls._playing:
+            each._update_progress(now)
+        return True
+
+    def _update_progress(self, now):
+        if self.effect_length:
+            played = now - self.effect_start
+            ratio = min(played * self._inverse_length, 1.0)
             self.progress.set_fraction(ratio)
             self.tabeffectprog.set_fraction(ratio)
             self.tabeffecttime.set_text("{:4.1f}".format(self.effect_length - played))
-        return True
 
     def _stop_progress(self):
-        if self.timeout_source_id:
-            source_remove(self.timeout_source_id)
-            self.timeout_source_id = None
+        if self in self._playing:
+            self._playing.remove(self)
+            if not self._playing:
+                source_remove(Effect._progress_source_id)
+                Effect._progress_source_id = None
             self.progress.set_fraction(0.0)
             self.approot.jingles.nb_effects_box.remove(self.tabwidget)
             self.approot.effect_stopped(self.num)
 
-    def _on_dialog_response(self, dialog, response_id, pathname=None):
-        if response_id in (Gtk.ResponseType.ACCEPT, Gtk.ResponseType.NO):
-            self.pathname = pathname or dialog.get_filename()
-            text = dialog.button_entry.get_text() if self.pathname and \
-                                        os.path.isfile(self.pathname) else ""
-            if response_id == Gtk.ResponseType.NO:
-                dialog.unselect_all()
-                dialog.set_filename("")
-                dialog.set_current_folder(os.path.expanduser("~"))
-                dialog.button_entry.set_text("")
-                dialog.gain_adj.set_value(0.0)
-                dialog._stored_filename = None
-                self.pathname = ""
-                text = ""
-            text = text.strip()
-            sens = bool(text)
-            for each in self.trigger, self.stop, self.repeat:
-                each.set_sensitive(sens)
-            self.config_image.set_visible(sens)
-
-            self.trigger_label.set_use_markup(True)
-            self.trigger_label.set_label(GLib.markup_escape_text(text))
-            self.level = dialog.gain_adj.get_value()
-
-            sens = self.pathname is not None and os.path.isfile(self.pathname)
-            if response_id == Gtk.ResponseType.ACCEPT and pathname is not None:
-                self.uuid = str(uuid.uuid4())
-            self.effect_length = 0.0 # Force effect length to be read again.
+    def _on_dialog_response(self, dialog, response_id):
+        if response_id == Gtk.ResponseType.ACCEPT:
+            self._apply_config(dialog.get_filename(),
+                    dialog.button_entry.get_text(), dialog.gain_adj.get_value())
+        elif response_id == Gtk.ResponseType.NO:
+            self._clear_config()
+
+    def _clear_config(self):
+        dialog = self._dialog
+        if dialog is not None:
+            dialog.unselect_all()
+            dialog.set_filename("")
+            dialog.set_current_folder(os.path.expanduser("~"))
+            dialog.button_entry.set_text("")
+            dialog.gain_adj.set_value(0.0)
+            dialog._stored_filename = None
+        self._apply_config("", "", 0.0)
+
+    def _apply_config(self, pathname, text, level, new_uuid=False):
+        self.pathname = pathname
+        if pathname and os.path.isfile(pathname):
+            # Same as the config dialog, where no text means its placeholder.
+            text = text.strip() or _('No Name')
+        else:
+            text = ""
+        sens = bool(text)
+        for each in self.trigger, self.stop, self.repeat:
+            each.set_sensitive(sens)
+        self.config_image.set_visible(sens)
+
+        # The label markup for when not highlighted and highlighted.
+        self._label_markup = GLib.markup_escape_text(text)
+        self._label_highlight = "<span foreground='red' font_weight='bold'>{}</span>".format(self._label_markup)
+        self.trigger_label.set_label(self._label_markup)
+        self.level = level
+
+        if new_uuid:
+            self.uuid = str(uuid.uuid4())
+        self.effect_length = 0.0 # Force effect length to be read again.
+        self._marshalled = None
 
     def marshall(self):
+        # Reuse the last result while neither the effect nor the links changed.
+        if self._marshalled is not None and \
+                                self._marshalled[0] == link_uuid_reg.version:
+            return self._marshalled[1]
+
         link = link_uuid_reg.get_link_filename(self.uuid)
         if link is not None:
             # Replace orig file abspath with alternate path to a hard link
             # except when link is None as happens when a hard link fails.
             link = PathStr("links") / link
             self.pathname = PM.basedir / link
-            if not self.dialog.get_visible():
-                self.dialog.set_filename(self.pathname)
-        return json.dumps([self.trigger_label.get_text(),
+        data = json.dumps([self.trigger_label.get_text(),
                           (link or self.pathname), self.level, self.uuid])
+        self._marshalled = (link_uuid_reg.version, data)
+        return data
 
     def unmarshall(self, data):
         try:
@@ -324,15 +411,8 @@ class Effect(Gtk.Grid):
 
         if pathname is not None and not pathname.startswith(os.path.sep):
             pathname = PM.basedir / pathname
-        if pathname is None or not os.path.isfile(pathname):
-            self.dialog.unselect_all()
-            label = ""
-        else:
-            self.dialog.set_filename(pathname)
-        self.dialog.button_entry.set_text(label)
-        self.dialog.gain_adj.set_value(level)
-        self._on_dialog_response(self.dialog, Gtk.ResponseType.ACCEPT, pathname)
-        self.pathname = pathname
+        self._apply_config(pathname, label, level,
+                                                new_uuid=pathname is not None)
 
     def update_highlight(self, highlight):
         if highlight != self.highlight:
@@ -343,11 +423,8 @@ class Effect(Gtk.Grid):
             elif not highlight:
                 self._stop_progress()
 
-            if self.trigger_label.get_use_markup():
-                if highlight:
-                    self.trigger_label.set_label("<span foreground='red' font_weight='bold'>{}</span>".format(self.trigger_label.get_label()))
-                else:
-                    self.trigger_label.set_label(GLib.markup_escape_text(self.trigger_label.get_text()))
+            self.trigger_label.set_label(self._label_highlight if highlight
+                                         else self._label_markup)
 
 
 class EffectConfigDialog(Gtk.FileChooserDialog):
@@ -357,8 +434,9 @@ class EffectConfigDialog(Gtk.FileChooserDialog):
     file_filter.set_name(_('Supported media'))
     for each in supported.media:
         if each not in (".cue", ".txt"):
-            file_filter.add_pattern("*" + each)
-            file_filter.add_pattern("*" + each.upper())
+            # One case insensitive pattern, e.g. *.[mM][pP]3
+            file_filter.add_pattern("*" + "".join("[{}{}]".format(
+                    c, c.upper()) if c.isalpha() else c for c in each))
 
     def __init__(self, effect, window):
         Gtk.FileChooserDialog.__init__(self, title=_('Effect {} Config'.format(effect.num + 1)),
@@ -429,6 +507,18 @@ class EffectConfigDialog(Gtk.FileChooserDialog):
 class EffectBank(Gtk.Frame):
     """A vertical stack of effects with level controls."""
 
+    # Level control icons, shared by all banks.
+    _level_pixbufs = None
+
+    @classmethod
+    def _get_level_pixbufs(cls):
+        if cls._level_pixbufs is None:
+            cls._level_pixbufs = tuple(
+                    GdkPixbuf.Pixbuf.new_from_file_at_scale(
+                    PGlobs.themedir / name, 16, 16, True)
+                    for name in ("volume16.svg", "headroom16.svg"))
+        return cls._level_pixbufs
+
     def __init__(self, qty, base, filename, parent, all_effects, vol_adj, mute_adj):
         Gtk.Frame.__init__(self)
         self.base = base
@@ -442,6 +532,9 @@ class EffectBank(Gtk.Frame):
 
         self.effects = []
         self.all_effects = all_effects
+        # The effect highlight bits of this bank and their last values.
+        self._bank_mask = ((1 << qty) - 1) << base
+        self._last_bits = 0
 
         count = 0
 
@@ -452,12 +545,15 @@ class EffectBank(Gtk.Frame):
             vbox.pack_start(effect)
             count += 1
 
+        # Each effect keyed by its highlight bit.
+        self._effect_for_bit = {1 << (i + base): effect
+                                    for i, effect in enumerate(self.effects)}
+
         level_vbox = Gtk.VBox()
         hbox.pack_start(level_vbox, False, padding=3)
 
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(PGlobs.themedir / "volume16.svg",
-                                                         16, 16, True)
-        vol_image = Gtk.Image.new_from_pixbuf(pixbuf)
+        vol_pixbuf, headroom_pixbuf = self._get_level_pixbufs()
+        vol_image = Gtk.Image.new_from_pixbuf(vol_pixbuf)
         vol_image.set_margin_top(2)
 
         # vol_image = Gtk.Image.new_from_file(PGlobs.themedir / "volume2.png")
@@ -467,9 +563,7 @@ class EffectBank(Gtk.Frame):
         set_tip(vol, _('Effects volume.'))
 
 
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(PGlobs.themedir / "headroom16.svg",
-                                                         16, 16, True)
-        headroom_image = Gtk.Image.new_from_pixbuf(pixbuf)
+        headroom_image = Gtk.Image.new_from_pixbuf(headroom_pixbuf)
         headroom_image.set_margin_top(2)
         #pb = GdkPixbuf.Pixbuf.new_from_file(PGlobs.themedir / "headroom.png")
         #mute_image = Gtk.Image.new_from_pixbuf(pb)
@@ -506,18 +600,23 @@ class EffectBank(Gtk.Frame):
             print("failed to write effects session file")
 
     def update_highlights(self, bits):
-        for bit, each in enumerate(self.effects):
-            each.update_highlight((1 << bit + self.base) & bits)
+        changed = (bits ^ self._last_bits) & self._bank_mask
+        self._last_bits = bits
+        # Visit only the effects whose bit changed, lowest first.
+        while changed:
+            low = changed & -changed
+            self._effect_for_bit[low].update_highlight(bits & low)
+            changed ^= low
 
     def stop(self):
         for each in self.effects:
-            each.stop.clicked()
+            each._stop_effect()
 
     def uuids(self):
-        return (x.uuid for x in self.widgets)
+        return tuple(x.uuid for x in self.effects)
 
     def pathnames(self):
-        return (x.pathname for x in self.widgets)
+        return tuple(x.pathname for x in self.effects)
 
 
 class EffectsPlayers(Gtk.HBox):
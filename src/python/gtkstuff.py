@@ -694,7 +694,9 @@ class IconChooserButton(Gtk.Button):
         self._dialog = dialog
         self._image = image
         self._label = label
-        self.set_filename(dialog.get_filename())
+        # The dialog may be shared between buttons so its selection is not
+        # taken as ours.
+        self.set_filename(None)
 
     def set_filename(self, f):
         try:
@@ -709,20 +711,22 @@ class IconChooserButton(Gtk.Button):
             self._label.set_text(disp)
             self._image.set_from_pixbuf(pb)
             self._filename = f
-            self._dialog.set_filename(f)
         self.emit("filename-changed", self._filename)
 
     def get_filename(self):
         return self._filename
 
     def _cb_clicked(self, button, dialog):
+        # The dialog may be shared so it is set from this button alone.
+        if self._filename is not None:
+            dialog.set_filename(self._filename)
+        else:
+            dialog.unselect_all()
+            dialog.set_current_folder(os.path.expanduser("~"))
         response = dialog.run()
         if response == Gtk.ResponseType.OK:
             self.set_filename(dialog.get_filename())
         elif response == Gtk.ResponseType.NONE:
-            filename = self.get_filename()
-            if filename is not None:
-                dialog.set_filename(filename)
             self.set_filename(None)
         dialog.hide()
 
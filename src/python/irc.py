@@ -23,9 +23,10 @@ import sys
 import threading
 import traceback
 import gettext
-from inspect import getargspec
-from functools import wraps, partial
+from functools import wraps, partial, lru_cache
+from collections import Counter, deque
 from itertools import chain
+from operator import attrgetter
 
 import gi
 from gi.repository import GObject
@@ -45,13 +46,22 @@ except ImportError:
 else:
     HAVE_IRC = True
 
+try:
+    import orjson
+except ImportError:
+    json_dumps = json.dumps
+    json_loads = json.loads
+else:
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode()
+    json_loads = orjson.loads
+
 from idjc import FGlobs
 from idjc.prelims import ProfileManager
 from .gtkstuff import DefaultEntry
 from .gtkstuff import NamedTreeRowReference
 from .gtkstuff import ConfirmationDialog
 from .gtkstuff import idle_add, idle_wait, timeout_add, source_remove
-from .utils import string_multireplace
 from .tooltips import set_tip
 
 __all__ = ["IRCPane"]
@@ -78,6 +88,11 @@ XCHAT_COLOR = {
     15: 0x959595FF
 }
 
+# IRC colour codes in their one and two digit forms to "#rrggbb" strings.
+COLOUR_STRING = {key: "#{:06X}".format(rgba >> 8)
+                        for code, rgba in XCHAT_COLOR.items()
+                        for key in (str(code), "{:02d}".format(code))}
+
 MESSAGE_CATEGORIES = (
         # TC: IRC message subcategory, triggers on new track announcements.
         _("Track announce"),
@@ -91,10 +106,19 @@ MESSAGE_CATEGORIES = (
         _("Operations"))
 
 ASCII_C0 = "".join(chr(x) for x in range(32))
+ASCII_C0_SET = frozenset(ASCII_C0)
+COMMA_TO_SPACE = str.maketrans(",", " ")
 
-CODES_AND_DESCRIPTIONS = zip((u"%r", u"%t", u"%l", u"%s", u"%n", u"%d", u"%u", u"%U"),
+CODES_AND_DESCRIPTIONS = tuple(zip((u"%r", u"%t", u"%l", u"%s", u"%n", u"%d", u"%u", u"%U"),
         (_('Artist'), _('Title'), _('Album'), _('Song name'),
-         _('DJ name'), _('Description'), _('Listen URL'), _('Source URI')))
+         _('DJ name'), _('Description'), _('Listen URL'), _('Source URI'))))
+
+
+@lru_cache(maxsize=1)
+def title_extra():
+    """Window title profile text, which is fixed once the profile is chosen."""
+
+    return ProfileManager().title_extra
 
 
 class IRCEntry(Gtk.Entry):  # pylint: disable=R0904
@@ -238,7 +262,7 @@ class IRCEntry(Gtk.Entry):  # pylint: disable=R0904
         """Insert the colour palette control code."""
 
         cursor = entry.get_position()
-        if cursor < 3 or entry.get_text()[cursor - 3] !="\x03":
+        if cursor < 3 or entry.get_chars(cursor - 3, cursor - 2) != "\x03":
             # Foreground colour.
             entry.insert_text("\u0003{:02d}".format(code), cursor)
         else:
@@ -264,16 +288,8 @@ class IRCView(Gtk.TextView):
     Variables are substituted for human readable place markers.
     """
 
-    matches = tuple((a, re.compile(b)) for a, b in (
-        ("foreground_background", "\x03[0-9]{1,2},[0-9]{1,2}"),
-        ("foreground",  "\x03[0-9]{1,2}(?!=,)"),
-        ("bold", "\x02"),
-        ("underline",  "\x1F"),
-        ("normal", "\x0F"),
-        ("text", "[^\x00-\x1F]*"),
-        ))
-
-    readable_equiv = tuple((x, "<{}>".format(y)) for x, y in CODES_AND_DESCRIPTIONS)
+    readable_equiv = {x: "<{}>".format(y) for x, y in CODES_AND_DESCRIPTIONS}
+    readable_equiv_re = re.compile("|".join(map(re.escape, readable_equiv)))
 
     def __init__(self):
         Gtk.TextView.__init__(self)
@@ -281,8 +297,13 @@ class IRCView(Gtk.TextView):
         self.set_wrap_mode(Gtk.WrapMode.CHAR)
         self.set_editable(False)
         self.set_cursor_visible(False)
-        self._rslt = self._foreground = self._background = None
+        self._foreground = self._background = None
         self._bold = self._underline = False
+        self._markup = []
+        # The anonymous tags made by the last insert_markup.
+        self._markup_tags = []
+        self.get_buffer().get_tag_table().connect("tag-added",
+                                                  self._on_tag_added)
 
     def set_text(self, text):
         """Apply text to the viewer.
@@ -290,90 +311,138 @@ class IRCView(Gtk.TextView):
         IRC text formatting is handled and the view updated.
         """
 
-        text = string_multireplace(text, self.readable_equiv)
-
-        buf = self.get_buffer()
-        buf.remove_all_tags(buf.get_start_iter(), buf.get_end_iter())
-        buf.delete(buf.get_start_iter(), buf.get_end_iter())
+        text = self.readable_equiv_re.sub(
+                            lambda m: self.readable_equiv[m.group()], text)
 
-        start = 0
+        # Plain text with no control codes needs no scanning.
+        if ASCII_C0_SET.isdisjoint(text):
+            if text:
+                self._handle_text(text)
+        else:
+            for name, value in self._tokenize(text):
+                # Execute the handler routine.
+                getattr(self, "_handle_" + name)(value)
 
-        while start < len(text):
-            for name, match in self.matches:
-                self._rslt = match.match(text, start)
-                if self._rslt is not None and self._rslt.group():
-                    # Execute the handler routine.
-                    getattr(self, "_handle_" + name)()
+            self._foreground = self._background = None
+            self._bold = self._underline = False
 
-                    start = self._rslt.end()
-                    break
-            else:
-                start += 1
+        # The buffer is kept. Only the previous insert_markup's tags are
+        # removed, so they don't accumulate.
+        buf = self.get_buffer()
+        table = buf.get_tag_table()
+        for tag in self._markup_tags:
+            table.remove(tag)
+        del self._markup_tags[:]
+        buf.set_text("")
+        buf.insert_markup(buf.get_end_iter(), "".join(self._markup), -1)
+        del self._markup[:]
 
-        self._foreground = self._background = None
-        self._bold = self._underline = False
+    def _on_tag_added(self, table, tag):
+        self._markup_tags.append(tag)
 
     @staticmethod
-    def _colour_string(code):
-        """The colour as a string of format "#rrggbb.
+    def _tokenize(text):
+        """Generate (name, value) tokens from IRC formatted text.
 
-        rgb = red, green, blue as a 2 digit hex number."""
+        A single forward pass with no backtracking. Unsupported control
+        characters are dropped.
+        """
 
-        return "#{:06X}".format((XCHAT_COLOR[int(code)] >> 8))
+        digits = "0123456789"
+        end = len(text)
+        i = 0
+
+        while i < end:
+            ch = text[i]
+            if ch == "\x03":
+                j = i + 1
+                while j < end and j - i <= 2 and text[j] in digits:
+                    j += 1
+                if j == i + 1:
+                    # Colour code lacking a colour number.
+                    i = j
+                    continue
+
+                foreground = text[i + 1:j]
+                if j < end and text[j] == ",":
+                    k = j + 1
+                    while k < end and k - j <= 2 and text[k] in digits:
+                        k += 1
+                    if k > j + 1:
+                        yield "foreground_background", (foreground,
+                                                            text[j + 1:k])
+                        i = k
+                        continue
+
+                yield "foreground", foreground
+                i = j
+            elif ch == "\x02":
+                yield "bold", None
+                i += 1
+            elif ch == "\x1F":
+                yield "underline", None
+                i += 1
+            elif ch == "\x0F":
+                yield "normal", None
+                i += 1
+            elif ch in ASCII_C0_SET:
+                i += 1
+            else:
+                j = i + 1
+                while j < end and text[j] not in ASCII_C0_SET:
+                    j += 1
+                yield "text", text[i:j]
+                i = j
 
-    def _handle_bold(self):
+    def _handle_bold(self, value):
         """Bold toggle."""
 
         self._bold = not self._bold
 
-    def _handle_underline(self):
+    def _handle_underline(self, value):
         """Underline toggle."""
 
         self._underline = not self._underline
 
-    def _handle_foreground(self):
+    def _handle_foreground(self, foreground):
         """Foreground colour setting."""
 
-        try:
-            self._foreground = self._rslt.group()[1:]
-        except IndexError:
-            self._foreground = None
+        self._foreground = foreground
 
-    def _handle_foreground_background(self):
+    def _handle_foreground_background(self, colours):
         """Foreground and background colour setting."""
 
-        try:
-            self._foreground, self._background = \
-                            self._rslt.group()[1:].split(",")
-        except IndexError:
-            self._foreground = self._background = None
+        self._foreground, self._background = colours
 
-    def _handle_normal(self):
+    def _handle_normal(self, value):
         """The normal formatting tag."""
 
         self._bold = self._underline = False
         self._foreground = self._background = None
 
-    def _handle_text(self):
-        """Normal printable text."""
+    def _handle_text(self, text):
+        """Normal printable text, queued as markup."""
 
-        buf = self.get_buffer()
-        tag = buf.create_tag()
-        props = tag.props
-        props.family = "monospace"
-        try:
-            props.foreground = self._colour_string(self._foreground)
-            props.background = self._colour_string(self._background)
-        except (TypeError, KeyError):
-            pass
+        self._markup.append(f"<span{self._span_attributes()}>"
+                            f"{GLib.markup_escape_text(text)}</span>")
+
+    def _span_attributes(self):
+        """Pango markup span attributes for the current formatting state."""
+
+        attrs = " font_family='monospace'"
+        foreground = COLOUR_STRING.get(self._foreground)
+        if foreground is not None:
+            attrs += f" foreground='{foreground}'"
+            background = COLOUR_STRING.get(self._background)
+            if background is not None:
+                attrs += f" background='{background}'"
 
         if self._underline:
-            props.underline = Pango.Underline.SINGLE
+            attrs += " underline='single'"
         if self._bold:
-            props.weight = Pango.Weight.BOLD
+            attrs += " weight='bold'"
 
-        buf.insert_with_tags(buf.get_end_iter(), self._rslt.group(),
-                                                            tag)
+        return attrs
 
 
 class EditDialogMixin(object):
@@ -408,10 +477,32 @@ class ServerDialog(Gtk.Dialog):
     optinfo = _("Optional data entry field for information only.")
     # Adjustment defined on the class to remember the previous choice.
     port_adj = Gtk.Adjustment(value=6667.0, lower=0.0, upper=65535.0, step_increment=1.0, page_increment=10.0)
+    # Data entry field labels and widget attribute names in grid order.
+    _fields = (
+        # TC: The IRC network e.g. EFnet.
+        (_("Network"), "network"),
+        # TC: label for hostname entry.
+        (_("Hostname"), "hostname"),
+        # TC: TCP/IP port number label.
+        (_("Port"), "port"),
+        (_("Encoding"), "encoding"),
+        (_("User name"), "username"),
+        (_("Password"), "password"),
+        ("", "manual_start"),
+        # TC: IRC nickname data entry label.
+        (_("Nickname"), "nick1"),
+        # TC: Second choice of IRC nickname.
+        (_("Second choice"), "nick2"),
+        # TC: Third choice of IRC nickname.
+        (_("Third choice"), "nick3"),
+        # TC: The IRC user's 'real' name.
+        (_("Real name"), "realname"),
+        # TC: The NickServ password.
+        (_("NickServ p/w"), "nickserv"))
 
     # TC: Tab heading text.
     def __init__(self, title=_("IRC server")):
-        Gtk.Dialog.__init__(self, title=f"{title} - IDJC{ProfileManager().title_extra}")
+        Gtk.Dialog.__init__(self, title=f"{title} - IDJC{title_extra()}")
 
         self.network = Gtk.Entry()
         set_tip(self.network, self.optinfo)
@@ -450,38 +541,17 @@ class ServerDialog(Gtk.Dialog):
         hbox.pack_start(image, False, padding=20)
         hbox.pack_start(table, True)
 
-        for i, (text, widget) in enumerate(zip((
-                            # TC: The IRC network e.g. EFnet.
-                            _("Network"),
-                            # TC: label for hostname entry.
-                            _("Hostname"),
-                            # TC: TCP/IP port number label.
-                            _("Port"),
-                            _("Encoding"),
-                            _("User name"),
-                            _("Password"), "",
-                            # TC: IRC nickname data entry label.
-                            _("Nickname"),
-                            # TC: Second choice of IRC nickname.
-                            _("Second choice"),
-                            # TC: Third choice of IRC nickname.
-                            _("Third choice"),
-                            # TC: The IRC user's 'real' name.
-                            _("Real name"),
-                            # TC: The NickServ password.
-                            _("NickServ p/w")),
-                (self.network, self.hostname, self.port, self.encoding,
-                 self.username, self.password, self.manual_start, self.nick1,
-                 self.nick2, self.nick3, self.realname, self.nickserv))):
-            # TC: Tooltip to IRC 'User name' field.
-            set_tip(self.username, _("Ideally set this to something even on "
-                                "servers that allow public anonymous access."))
+        for i, (text, attr) in enumerate(self._fields):
+            widget = getattr(self, attr)
             label = Gtk.Label.new(text)
             label.set_xalign(1.0)
             table.attach(label, 0, i, 1, 1)
             widget.set_hexpand(True)
             table.attach(widget, 1, i, 1, 1)
 
+        # TC: Tooltip to IRC 'User name' field.
+        set_tip(self.username, _("Ideally set this to something even on "
+                            "servers that allow public anonymous access."))
         for each in (self.nick1, self.nick2, self.nick3):
             # TC: tooltip to all IRC nicknames entry fields.
             set_tip(each, _("When a nickname is in use on the target IRC "
@@ -533,20 +603,20 @@ class EditServerDialog(ServerDialog, EditDialogMixin):
     def from_tuple(self, orig_data):
         """The data restore method."""
 
-        element = iter(orig_data)
-        self.manual_start.set_active(next(element))
-        self.port.set_value(next(element))
-        next(element)
-        self.network.set_text(next(element))
-        self.hostname.set_text(next(element))
-        self.username.set_text(next(element))
-        self.password.set_text(next(element))
-        self.nick1.set_text(next(element))
-        self.nick2.set_text(next(element))
-        self.nick3.set_text(next(element))
-        self.realname.set_text(next(element))
-        self.nickserv.set_text(next(element))
-        self.encoding.set_text(next(element))
+        (manual_start, port, _unused, network, hostname, username, password,
+                nick1, nick2, nick3, realname, nickserv, encoding) = orig_data
+        self.manual_start.set_active(manual_start)
+        self.port.set_value(port)
+        self.network.set_text(network)
+        self.hostname.set_text(hostname)
+        self.username.set_text(username)
+        self.password.set_text(password)
+        self.nick1.set_text(nick1)
+        self.nick2.set_text(nick2)
+        self.nick3.set_text(nick3)
+        self.realname.set_text(realname)
+        self.nickserv.set_text(nickserv)
+        self.encoding.set_text(encoding)
 
 
 message_delay_adj = Gtk.Adjustment(value=10, lower=0, upper=30, step_increment=1, page_increment=10)
@@ -565,7 +635,7 @@ class ChannelsDialog(Gtk.Dialog):
             title = self.title
 
         Gtk.Dialog.__init__(self,
-                            title=title + " - IDJC" + ProfileManager().title_extra)
+                            title=title + " - IDJC" + title_extra())
 
         chbox = Gtk.HBox()
         chbox.set_spacing(6)
@@ -595,8 +665,7 @@ class ChannelsDialog(Gtk.Dialog):
         self.channels.grab_focus()
 
     def _from_channels(self):
-        text = self.channels.get_text().replace(",", " ").split()
-        return ",".join(x for x in text if x)
+        return ",".join(self.channels.get_text().translate(COMMA_TO_SPACE).split())
 
     def as_tuple(self):
         """Data extraction method."""
@@ -638,12 +707,21 @@ class MessageDialog(ChannelsDialog):
         "will appear to users of XChat."))
         self.mainbox.pack_start(hbox, False)
 
-        sw = Gtk.ScrolledWindow()
-        sw.set_size_request(-1, 100)
-        sw.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.ALWAYS)
+        self._irc_view_sw = Gtk.ScrolledWindow()
+        self._irc_view_sw.set_size_request(-1, 100)
+        self._irc_view_sw.set_policy(Gtk.PolicyType.NEVER,
+                                                    Gtk.PolicyType.ALWAYS)
+        self.mainbox.pack_start(self._irc_view_sw, True, True)
+        self.connect("show", self._on_show)
+
+    def _on_show(self, dialog):
+        """Create the message preview when the dialog first appears."""
+
+        self.disconnect_by_func(self._on_show)
         irc_view = IRCView()
-        sw.add(irc_view)
-        self.mainbox.pack_start(sw, True, True)
+        irc_view.set_text(self.message.get_text())
+        self._irc_view_sw.add(irc_view)
+        irc_view.show()
 
         self.message.connect("changed",
                                     lambda w: irc_view.set_text(w.get_text()))
@@ -843,7 +921,7 @@ class IRCTreeView(Gtk.TreeView):
                 iter = model.get_iter(path[0])
                 mode = model.get_value(iter, 0)
                 if mode in (3, 5, 7, 9):
-                    message = model[model.get_path(iter)].message
+                    message = model[iter].message
                     irc_view = IRCView()
                     irc_view.set_text(message)
                     tooltip.set_custom(irc_view)
@@ -872,24 +950,25 @@ class IRCRowReference(NamedTreeRowReference):
         11: {"channels":5}
         }
 
+    # Keyed by (data type, name) including the names common to all types.
+    _flat_lookup = dict(chain(
+        (((data_type, name), index) for data_type, names in _lookup.items()
+                                    for name, index in names.items()),
+        (((data_type, name), index) for data_type in range(12)
+                            for name, index in (("type", 0), ("active", 1)))))
+
     def get_index_for_name(self, tree_row_ref, name):
         """An abstract method of the base class that performs the lookup."""
 
-        if name == "type":
-            return 0
-        elif name == "active":
-            return 1
-        else:
-            data_type = tree_row_ref[0]
-            return self._lookup[data_type][name]
+        return self._flat_lookup[(tree_row_ref[0], name)]
 
 
 class IRCTreeStore(Gtk.TreeStore):
     """The data storage object."""
 
-    @property
-    def data_format(self):
-        return (int, ) * 5 + (str, ) * 11
+    data_format = (int, ) * 5 + (str, ) * 11
+    signature = tuple(x.__name__ for x in data_format)
+    columns = list(range(len(data_format)))
 
     def __init__(self):
         Gtk.TreeStore.__init__(self, *self.data_format)
@@ -899,15 +978,23 @@ class IRCTreeStore(Gtk.TreeStore):
     def path_is_active(self, path):
         """True when this and all parent elements are active."""
 
-        path = path.copy()
-        while path:
-            if not self[path].active:
+        iter = self.get_iter(path)
+        while iter is not None:
+            if not self.get_value(iter, 1):
                 return False
-            if not path.up():  # Ambiguity WRT docs prompts extra check.
-                return True
+            iter = self.iter_parent(iter)
 
         return True
 
+    def insert_row(self, parent, position, row):
+        """Insert a complete row, setting all its columns in one call.
+
+        This bypasses the Python level per-column value conversion of the
+        insert method override.
+        """
+
+        return self.insert_with_values(parent, position, self.columns, row)
+
     def row_changed_block(self):
         self._row_changed_blocked = True
 
@@ -926,6 +1013,59 @@ class IRCTreeStore(Gtk.TreeStore):
         return IRCRowReference(Gtk.TreeStore.__getitem__(self, path))
 
 
+# Row building blocks for IRCTreeStore.
+BLANK_9 = ("", ) * 9
+BLANK_10 = ("", ) * 10
+ROOT_ROW = (0, 1, 0, 0, 0) + ("", ) * 11
+SERVER_SUBROWS = tuple((x, 1, 0, 0, 0) + ("", ) * 11
+                    for x in range(2, 2 + len(MESSAGE_CATEGORIES) * 2, 2))
+
+# TC: Indicator text: We used a password.
+PASSWORD_TEXT = _("PASSWORD")
+# TC: Indicator text: We interact with NickServ.
+NICKSERV_TEXT = _("NICKSERV")
+# TC: Indicator text: Server connection started manually.
+MANUAL_TEXT = _("MANUAL")
+
+
+def _server_cell_text(row):
+    text = f"{row.nick}@" if row.nick else ""
+    text += f"{row.hostname}:{row.port}"
+    if row.network:
+        text += f"({row.network})"
+
+    opt = []
+    if row.password:
+        opt.append(PASSWORD_TEXT)
+    if row.nickserv:
+        opt.append(NICKSERV_TEXT)
+    if row.manual:
+        opt.append(MANUAL_TEXT)
+    if opt:
+        text += f" {', '.join(opt)}"
+
+    return text
+
+
+def _message_cell_text(row):
+    return f"{row.channels}; {row.message}"
+
+
+# IRCPane tree cell text generators keyed by row type.
+CELL_TEXT = {
+    1: _server_cell_text,
+    3: lambda row: f"+{row.delay};{row.channels}; {row.message}",
+    5: lambda row: f"{row.offset}/{row.interval};{row.channels}; {row.message}",
+    7: _message_cell_text,
+    9: _message_cell_text,
+    11: lambda row: row.channels
+}
+
+# The even row types are headings.
+CELL_TEXT.update((i * 2, lambda row, heading=heading: heading)
+                for i, heading in enumerate(("Server", ) + MESSAGE_CATEGORIES))
+
+
 class IRCPane(Gtk.VBox):
     """The main user interface."""
 
@@ -934,7 +1074,7 @@ class IRCPane(Gtk.VBox):
         self.set_border_width(8)
         self.set_spacing(3)
         self._treestore = IRCTreeStore()
-        self._treestore.insert(None, 0, (0, 1, 0, 0, 0) + ("", ) * 11)
+        self._treestore.insert_row(None, 0, ROOT_ROW)
         self._treeview = IRCTreeView(self._treestore)
 
         col = Gtk.TreeViewColumn()
@@ -988,7 +1128,7 @@ class IRCPane(Gtk.VBox):
         Used to crosscheck with that of the saved data to test for usability.
         """
 
-        return [x.__name__ for x in self._treestore.data_format]
+        return list(self._treestore.signature)
 
     def marshall(self):
         """Convert all our data into a string."""
@@ -996,25 +1136,26 @@ class IRCPane(Gtk.VBox):
         if HAVE_IRC:
             store = [self._m_signature()]
             self._treestore.foreach(self._m_read, store)
-            return json.dumps(store)
+            return json_dumps(store)
         else:
             return ""
 
     def _m_read(self, model, path, iter, store):
-        row = IRCRowReference(list(model[path]))
-        if row.type == 1:
-            row.nick = ""
-            if row.manual:
-                row.active = 0
+        row = list(model[path])
+        # Server rows: clear nick (15), deactivate (1) if manual (2).
+        if row[0] == 1:
+            row[15] = ""
+            if row[2]:
+                row[1] = 0
 
-        store.append((path.get_indices(), list(row)))
+        store.append((path.get_indices(), row))
 
     def unmarshall(self, data):
         """Set the TreeStore with data from a string."""
 
         if HAVE_IRC:
             try:
-                store = json.loads(data)
+                store = json_loads(data)
             except ValueError:
                 return
 
@@ -1032,12 +1173,18 @@ class IRCPane(Gtk.VBox):
 
             selection = self._treeview.get_selection()
             selection.handler_block_by_func(self._on_selection_changed)
+            # Detached from the view so the rows aren't laid out one by one.
+            # The model's own row-inserted handlers still run as they create
+            # the IRC connections and message handlers.
+            self._treeview.set_model(None)
             self._treestore.clear()
             for path, row in store:
                 pos = path.pop()
                 pi = self._treestore.get_iter(tuple(path)) if path else None
-                self._treestore.insert(pi, pos, row + extra_data)
+                row.extend(extra_data)
+                self._treestore.insert_row(pi, pos, row)
 
+            self._treeview.set_model(self._treestore)
             self._treeview.expand_all()
             selection.handler_unblock_by_func(self._on_selection_changed)
             selection.select_path(0)
@@ -1065,47 +1212,8 @@ class IRCPane(Gtk.VBox):
         given too much priority. For that there is the tooltip IRCView.
         """
 
-        row = model[model.get_path(iter)]
-        text = ""
-
-        if row.type % 2:
-            if row.type == 1:
-                if row.nick:
-                    text = row.nick + "@"
-                text += "{}:{}".format(row.hostname, row.port)
-                if row.network:
-                    text += "({})".format(row.network)
-
-                opt = []
-                if row.password:
-                    # TC: Indicator text: We used a password.
-                    opt.append(_("PASSWORD"))
-                if row.nickserv:
-                    # TC: Indicator text: We interact with NickServ.
-                    opt.append(_("NICKSERV"))
-                if row.manual:
-                    # TC: Indicator text: Server connection started manually.
-                    opt.append(_("MANUAL"))
-                if opt:
-                    text += " {}".format(', '.join(opt))
-            else:
-                channels = row.channels
-
-                if row.type < 11:
-                    message = row.message
-
-                    if row.type == 3:
-                        text = "+{};{}; {}".format(row.delay, channels, message)
-                    elif row.type == 5:
-                        text = "{}/{};{}; {}".format(row.offset, row.interval, channels, message)
-                    elif row.type in (7, 9):
-                        text = "{}; {}".format(channels, message)
-                elif row.type == 11:
-                    text = channels
-        else:
-            text = (("Server", ) + MESSAGE_CATEGORIES)[int(row.type / 2)]
-
-        cell.props.text = text
+        row = model[iter]
+        cell.props.text = CELL_TEXT[row.type](row)
 
 
     # TC: Dialog title text.
@@ -1133,7 +1241,7 @@ class IRCPane(Gtk.VBox):
 
     @glue
     def _on_edit(self, mode, model, iter, dialog):
-        row = tuple(model[model.get_path(iter)])
+        row = tuple(model[iter])
 
         if mode == 1:
             dialog(EditServerDialog(row[2:15]), self._standard_edit, 2)
@@ -1167,33 +1275,33 @@ class IRCPane(Gtk.VBox):
         if row.manual:
             row.active = 0
 
-        iter = model.insert(parent_iter, 0, row)
+        iter = model.insert_row(parent_iter, 0, list(row))
 
         # Add the subelements.
-        for i, x in enumerate(range(2, 2 + len(MESSAGE_CATEGORIES) * 2, 2)):
-            model.insert(iter, i, (x, 1, 0, 0, 0) + ("", ) * 11)
+        for i, subrow in enumerate(SERVER_SUBROWS):
+            model.insert_row(iter, i, subrow)
 
         return iter
 
     @highlight
     def _add_announce(self, d, model, parent_iter):
-        return model.insert(parent_iter, 0, (3, 1, 0, 0) + d.as_tuple()
-                                                                + ("", ) * 9)
+        return model.insert_row(parent_iter, 0, (3, 1, 0, 0) + d.as_tuple()
+                                                                    + BLANK_9)
 
     @highlight
     def _add_timer(self, d, model, parent_iter):
-        return model.insert(parent_iter, 0, (5, 1, 0) + d.as_tuple()
-                                                                + ("", ) * 9)
+        return model.insert_row(parent_iter, 0, (5, 1, 0) + d.as_tuple()
+                                                                    + BLANK_9)
 
     @highlight
     def _add_message(self, d, model, parent_iter, mode):
-        return model.insert(parent_iter, 0, (mode + 1, 1, 0, 0, 0)
-                                                + d.as_tuple() + ("", ) * 9)
+        return model.insert_row(parent_iter, 0, (mode + 1, 1, 0, 0, 0)
+                                                + d.as_tuple() + BLANK_9)
 
     @highlight
     def _add_channels(self, d, model, parent_iter, mode):
-        return model.insert(parent_iter, 0, (mode + 1, 1, 0, 0, 0)
-                                                + d.as_tuple() + ("", ) * 10)
+        return model.insert_row(parent_iter, 0, (mode + 1, 1, 0, 0, 0)
+                                                + d.as_tuple() + BLANK_10)
 
 
 class ConnectionsController(list):
@@ -1232,14 +1340,19 @@ class ConnectionsController(list):
             self.append(IRCConnection(model, path, self._stream_active))
 
     def _on_row_deleted(self, model, path):
+        # Connections are found by row validity rather than by path since
+        # new servers go in at position 0, renumbering the existing ones.
         if len(path) == 2:
             for i, irc_conn in enumerate(self):
                 if not irc_conn.valid():
-                    self[i].cleanup()
+                    irc_conn.cleanup()
                     del self[i]
                     break
 
     def _on_row_changed(self, model, path, iter):
+        # Pass the change down since the activity of descendant rows depends
+        # on it. Category rows need this as well as server rows. Message
+        # rows are leaves so iter_children is the only work done for them.
         i = model.iter_children(iter)
         while i is not None:
             model.row_changed(model.get_path(i), i)
@@ -1254,6 +1367,32 @@ def child_path_of_parent_path(a, b):
     return a.is_descendant(b) and a.get_depth() - 1 == b.get_depth()
 
 
+# The part of each comma separated channels entry before any "!".
+CHANNEL_TARGET_RE = re.compile(r"(?:^|,)([^,!]+)")
+
+
+@lru_cache(maxsize=128)
+def parse_channels(channels):
+    """Parse the comma separated channels text of a message row.
+
+    Returns the channel entries and the message targets.
+    """
+
+    return (tuple(x for x in channels.split(",") if x),
+            tuple(CHANNEL_TARGET_RE.findall(channels)))
+
+
+@lru_cache(maxsize=128)
+def classify_targets(targets):
+    """Split a tuple of message targets into channels and users.
+
+    Channel keys are removed since they are not needed to send messages.
+    """
+
+    return (tuple(x.split(":")[0] for x in targets if x[0] in "#&"),
+            tuple(x for x in targets if x[0] not in "#&"))
+
+
 class IRCConnection(threading.Thread):
     """Self explanatory really."""
 
@@ -1261,9 +1400,14 @@ class IRCConnection(threading.Thread):
         threading.Thread.__init__(self)
         self._row_ref = Gtk.TreeRowReference.new(model, path)
         self._hooks = []
-        self._queue = []
-        self._played = []
+        self._queue = deque()
+        self._played = deque(maxlen=10)
         self._message_handlers = []
+        # Channel reference counts over all message handlers.
+        self._channel_count = Counter()
+        self._handler_channels = {}
+        self._pending_nick = ""
+        self._nick_idle_pending = False
         self._keepalive = True
         self._have_welcome = False
         self._stream_active = stream_active
@@ -1300,8 +1444,7 @@ class IRCConnection(threading.Thread):
 
     def new_metadata(self, new_meta):
         if self._stream_active:
-            self._played.insert(0, (new_meta["songname"], time.time()))
-            del self._played[10:]
+            self._played.appendleft((new_meta["songname"], time.time()))
 
         for each in self._message_handlers:
             each.new_metadata(new_meta)
@@ -1309,22 +1452,33 @@ class IRCConnection(threading.Thread):
     def _on_row_inserted(self, model, path, iter):
         if child_path_of_parent_path(path, self.get_path()):
             type_ = model[path].type
-            mh = globals()["MessageHandlerForType_" + str(type_ + 1)](model,
-                                                    path, self._stream_active)
+            mh = MESSAGE_HANDLERS[type_ + 1](model, path, self._stream_active)
             mh.connect("channels-changed", self._on_channels_changed)
-            mh.connect("privmsg-ready", self._on_privmsg_ready)
+            mh.connect("privmsg-batch-ready", self._on_privmsg_batch_ready)
             self._message_handlers.append(mh)
 
+    def _count_channels(self, channels, delta):
+        count = self._channel_count
+        for each in channels:
+            total = count[each] + delta
+            if total:
+                count[each] = total
+            else:
+                del count[each]
+
     def _on_channels_changed(self, message_handler, channel_set):
+        # Leave the counts covering just the other message handlers.
+        self._count_channels(
+                self._handler_channels.get(message_handler, ()), -1)
+
         if self._have_welcome:
-            rest = frozenset.union(frozenset(), *(x.props.channels
-                for x in self._message_handlers if x is not message_handler))
+            rest = self._channel_count
+            current = message_handler.channels
 
-            joins = channel_set.difference(rest and
-                                                message_handler.props.channels)
+            joins = channel_set.difference(current) if rest else channel_set
+            parts = [x for x in current.difference(channel_set)
+                                                            if x not in rest]
 
-            parts = message_handler.props.channels.difference(
-                                                channel_set).difference(rest)
             def deferred():
                 for each in joins:
                     if each[0] in "#&":
@@ -1342,28 +1496,44 @@ class IRCConnection(threading.Thread):
 
             self._queue.append(deferred)
 
+        self._count_channels(channel_set, 1)
+        self._handler_channels[message_handler] = channel_set
+
     def _channels_invalidate(self):
         for each in self._message_handlers:
             each.channels_invalidate()
 
-    def _on_privmsg_ready(self, handler, targets, message, delay):
+    def _on_privmsg_batch_ready(self, handler, batch):
         if self._have_welcome:
-            chan_targets = [x.split(":")[0] for x in targets if x[0] in "#&"]
-            user_targets = [x for x in targets if x[0] not in "#&"]
+            immediate = []
+            delayed = {}
+            for targets, message, delay in batch:
+                send = (classify_targets(targets), message)
+                if delay:
+                    delayed.setdefault(delay, []).append(send)
+                else:
+                    immediate.append(send)
 
             def deferred():
-                self.server.privmsg_many(chan_targets, message)
-                for target in user_targets:
-                    self.server.notice(target, message)
+                self._send_privmsgs(immediate)
+                # One scheduled call per distinct delay.
+                for delay, sends in delayed.items():
+                    self.server.reactor.scheduler.execute_after(
+                                    delay, partial(self._send_privmsgs, sends))
 
-            if delay:
-                self._queue.append(lambda: self.server.reactor.scheduler.execute_after(delay, deferred))
-            else:
-                self._queue.append(deferred)
+            self._queue.append(deferred)
+
+    def _send_privmsgs(self, sends):
+        for (chan_targets, user_targets), message in sends:
+            self.server.privmsg_many(chan_targets, message)
+            for target in user_targets:
+                self.server.notice(target, message)
 
     def _on_ui_row_changed(self, model, path, iter):
-        if path == self.get_path():
-            row = self.get_model()[self.get_path()]
+        # Server rows are all at depth 2. The depth test is cheap and spares
+        # resolving our own path for the many message and category rows.
+        if path.get_depth() == 2 and path == self.get_path():
+            row = model[path]
             if model.path_is_active(path):
                 ref = Gtk.TreeRowReference(model, path)
                 hostname = row.hostname
@@ -1392,8 +1562,9 @@ class IRCConnection(threading.Thread):
                         if not ref.valid() or not model.path_is_active(path):
                             print("IRC connection attempt cancelled")
                             return
-                        print(("Attempting to connect to IRC server {}:{}"
-                               "{}".format(hostname, port, ' no more retries' if not delays else '')))
+                        retries = "" if delays else " no more retries"
+                        print("Attempting to connect to IRC server "
+                              f"{hostname}:{port}{retries}")
                         try:
                             connect()
                         except client.ServerConnectionError as e:
@@ -1406,7 +1577,7 @@ class IRCConnection(threading.Thread):
                                 self.server.reactor.scheduler.execute_after(delay, partial(try_connect, delays[1:]))
                         else:
                             self._ui_set_nick(nickname)
-                            print("New IRC connection: {}@{}:{}".format(nickname, hostname, port))
+                            print(f"New IRC connection: {nickname}@{hostname}:{port}")
                     try_connect(delays=(1, 2, 3))
             else:
                 def deferred():
@@ -1427,8 +1598,8 @@ class IRCConnection(threading.Thread):
             self.server.add_global_handler(event, target)
 
         while self._keepalive:
-            while len(self._queue):
-                self._queue.pop(0)()
+            while self._queue:
+                self._queue.popleft()()
 
             self.reactor.process_once(0.2)
 
@@ -1459,13 +1630,20 @@ class IRCConnection(threading.Thread):
         self._keepalive = False
 
     def _ui_set_nick(self, nickname):
-        def closure():
-            if self.valid():
-                model = self.get_model()
-                model.row_changed_block()
-                model[self.get_path()].nick = nickname
-                model.row_changed_unblock()
-        idle_add(closure)
+        # Only the most recent nickname gets written per idle callback.
+        self._pending_nick = nickname
+        if not self._nick_idle_pending:
+            self._nick_idle_pending = True
+            idle_add(self._ui_apply_nick)
+
+    def _ui_apply_nick(self):
+        self._nick_idle_pending = False
+        nickname = self._pending_nick
+        if self.valid():
+            model = self.get_model()
+            model.row_changed_block()
+            model[self.get_path()].nick = nickname
+            model.row_changed_unblock()
 
     def _try_alternate_nick(self):
         try:
@@ -1482,12 +1660,10 @@ class IRCConnection(threading.Thread):
             print("Got IRC welcome", event.source)
             self._have_welcome = True
             self._channels_invalidate()
+            for each in self._message_handlers:
+                each.channels_reevaluate()
             model = self.get_model()
             path = self.get_path()
-            iter = model.iter_children(model.get_iter(path))
-            while iter is not None:
-                model.row_changed(model.get_path(iter), iter)
-                iter = model.iter_next(iter)
             row = model[path]
             model.row_changed_block()
             row.nick = event.target
@@ -1502,8 +1678,8 @@ class IRCConnection(threading.Thread):
     def _nick_recover(self, server, target, nspw):
         print("Will issue recover and release commands to NickServ")
         for i, (func, args) in enumerate((
-                (server.privmsg, ("NickServ", "RECOVER {} {}".format(target, nspw))),
-                (server.privmsg, ("NickServ", "RELEASE {} {}".format(target, nspw))),
+                (server.privmsg, ("NickServ", f"RECOVER {target} {nspw}")),
+                (server.privmsg, ("NickServ", f"RELEASE {target} {nspw}")),
                 (server.nick, (target,))), start=1):
             server.reactor.scheduler.execute_after(i, partial(func, *args))
 
@@ -1513,7 +1689,7 @@ class IRCConnection(threading.Thread):
             source = source.split("@")[0]
 
             if source != "Global!services":
-                print("-{}- {}".format(source, event.arguments[0]))
+                print(f"-{source}- {event.arguments[0]}")
 
             if source == "NickServ!services":
                 nspw = []
@@ -1523,7 +1699,7 @@ class IRCConnection(threading.Thread):
                 nspw = nspw[0]
 
                 if "NickServ IDENTIFY" in event.arguments[0] and nspw:
-                    server.privmsg("NickServ", "IDENTIFY {}".format(nspw))
+                    server.privmsg("NickServ", f"IDENTIFY {nspw}")
                     print("Issued IDENTIFY command to NickServ")
                     self._ui_set_nick(event.target)
                 elif "Guest" in event.arguments[0]:
@@ -1566,7 +1742,8 @@ class IRCConnection(threading.Thread):
                                             "PLAYED STREAMSTATUS KILLSTREAM")
 
         elif args == ["VERSION"]:
-            reply("VERSION {} {} (python-irc)".format(FGlobs.package_name, FGlobs.package_version))
+            reply(f"VERSION {FGlobs.package_name} {FGlobs.package_version} "
+                                                            "(python-irc)")
         elif args == ["TIME"]:
             reply("TIME " + time.ctime())
 
@@ -1587,8 +1764,9 @@ class IRCConnection(threading.Thread):
 
             for i, each in enumerate(show, start=1):
                 age = int((t - each[1]) // 60)
-                message = ("PLAYED \x0304{}\x0f, \x0306{} "
-                           "minute{} ago\x0f.".format(each[0], age, '' if age == 1 else 's'))
+                plural = "" if age == 1 else "s"
+                message = (f"PLAYED \x0304{each[0]}\x0f, \x0306{age} "
+                           f"minute{plural} ago\x0f.")
                 server.reactor.scheduler.execute_after(i, partial(reply, message))
 
             if not show:
@@ -1598,7 +1776,8 @@ class IRCConnection(threading.Thread):
                                                        partial(reply, "PLAYED End of list."))
 
         elif args == ["STREAMSTATUS"]:
-            reply("STREAMSTATUS The stream is {}".format('up' if self._stream_active else 'down'))
+            reply("STREAMSTATUS The stream is "
+                  f"{'up' if self._stream_active else 'down'}")
 
         elif args == ["KILLSTREAM"]:
             reply("KILLSTREAM This feature was added as a joke.")
@@ -1622,14 +1801,20 @@ class IRCConnection(threading.Thread):
         print("Args:", event.arguments())
 
 
+def zero_delay(row):
+    """The default message delay calculation: send immediately."""
+
+    return 0
+
+
 class MessageHandler(GObject.GObject):
     __gsignals__ = {
         'channels-changed': (GObject.SignalFlags.RUN_LAST | GObject.SignalFlags.ACTION,
                              GObject.TYPE_NONE, (GObject.TYPE_PYOBJECT, )),
 
-        'privmsg-ready':    (GObject.SignalFlags.RUN_LAST | GObject.SignalFlags.ACTION,
-                            GObject.TYPE_NONE, (GObject.TYPE_PYOBJECT,
-                            GObject.TYPE_STRING, GObject.TYPE_INT))
+        # A list of (targets, message, delay) tuples.
+        'privmsg-batch-ready': (GObject.SignalFlags.RUN_LAST | GObject.SignalFlags.ACTION,
+                            GObject.TYPE_NONE, (GObject.TYPE_PYOBJECT, ))
     }
 
     __gproperties__ = {
@@ -1641,22 +1826,50 @@ class MessageHandler(GObject.GObject):
     def stream_active(self):
         return self._stream_active
 
+    @property
+    def channels(self):
+        """Plain attribute access to the 'channels' property value."""
+
+        return self._channels
+
     subst_keys = ("artist", "title", "album", "songname", "djname",
                                     "description", "url", "source")
 
     subst_tokens = ("%r", "%t", "%l", "%s", "%n", "%d", "%u", "%U")
 
-    subst = dict.fromkeys(subst_keys, "<No data>")
+    _subst_keys_set = frozenset(subst_keys)
+
+    # Substitution values shared by all handlers, indexed like subst_keys.
+    subst_values = ["<No data>"] * len(subst_keys)
+    _subst_slots = {k: i for i, k in enumerate(subst_keys)}
+    # Bumped whenever subst_values is updated.
+    subst_version = 0
+
+    # Splits message text around "%%" and the substitution tokens.
+    _template_re = re.compile("(%s)" % "|".join(
+                                    map(re.escape, ("%%", ) + subst_tokens)))
+
+    # The template segment for each token: an index into subst_keys or "%".
+    _token_segments = dict(zip(subst_tokens, range(len(subst_tokens))))
+    _token_segments["%%"] = "%"
 
     def __init__(self, model, path, stream_active):
         GObject.GObject.__init__(self)
         self.tree_row_ref = Gtk.TreeRowReference(model, path)
+        # Tree depth of the message rows, which doesn't change.
+        self._child_depth = path.get_depth() + 1
 
         self._channels = frozenset()
         self._stream_active = stream_active
+        self._rendered = {}
+        self._rendered_version = self.subst_version
+        # Message row states by child index, as of the last reevaluation.
+        self._row_states = {}
+        # Iters of the active message rows or None when out of date.
+        self._active_iters = None
         model.connect("row-inserted", self.channels_evaluate)
         model.connect("row-deleted", self.channels_evaluate)
-        model.connect_after("row-changed", self.channels_evaluate)
+        model.connect_after("row-changed", self._on_row_changed)
 
     def set_stream_active(self, stream_active):
         if self._stream_active != stream_active:
@@ -1679,29 +1892,82 @@ class MessageHandler(GObject.GObject):
         pass
 
     def new_metadata(self, new_meta):
-        assert not frozenset(new_meta).difference(frozenset(self.subst_keys))
+        assert not new_meta.keys() - self._subst_keys_set
 
-        self.subst.update(new_meta)
+        values = self.subst_values
+        slots = self._subst_slots
+        for key, value in new_meta.items():
+            values[slots[key]] = value
+        MessageHandler.subst_version += 1
         self.on_new_metadata()
 
+    def is_child_path(self, path):
+        # Rows at other depths can't be ours so skip resolving our own path.
+        return path.get_depth() == self._child_depth and \
+                child_path_of_parent_path(path, self.tree_row_ref.get_path())
+
+    def row_state(self, row):
+        """The message row data that channels_reevaluate depends on."""
+
+        return row.channels
+
     def channels_evaluate(self, model, path, iter=None):
-        pp = self.tree_row_ref.get_path()
-        if child_path_of_parent_path(path, pp):
-            nc = set()
-
-            iter = model.iter_children(model.get_iter(pp))
-            while iter is not None:
-                rowpath = model.get_path(iter)
-                if model.path_is_active(rowpath):
-                    row = model[rowpath]
-                    for each in row.channels.split(","):
-                        if each:
-                            nc.add(each)
-                iter = model.iter_next(iter)
-
-            nc = frozenset(nc)
-            if nc != self._channels:
-                self.channels_changed(nc)
+        if self.is_child_path(path):
+            # Child indices may have shifted.
+            self._row_states.clear()
+            self._active_iters = None
+            self.channels_reevaluate()
+
+    def _on_row_changed(self, model, path, iter):
+        """Reevaluate only if the effective state of the row changed."""
+
+        if self.is_child_path(path):
+            self._active_iters = None
+            state = (model.path_is_active(path), self.row_state(model[iter]))
+            index = path.get_indices()[-1]
+            if self._row_states.get(index) != state:
+                self._row_states[index] = state
+                self.channels_reevaluate()
+
+    def active_rows(self):
+        """Generate the active message rows."""
+
+        model = self.tree_row_ref.get_model()
+        path = self.tree_row_ref.get_path()
+        # The ancestors are common to all the messages so check them once.
+        if not model.path_is_active(path):
+            return
+
+        if self._active_iters is None:
+            self._active_iters = self._snapshot_children(model, path)
+        for iter in self._active_iters:
+            yield model[iter]
+
+    def _snapshot_children(self, model, path):
+        """List the iters of the active message rows.
+
+        TreeStore iters persist so the list stays good until a message row
+        is added, removed, or changed.
+        """
+
+        iters = []
+        iter = model.iter_children(model.get_iter(path))
+        while iter is not None:
+            if model.get_value(iter, 1):
+                iters.append(iter)
+            iter = model.iter_next(iter)
+        return iters
+
+    def channels_reevaluate(self):
+        """Collect the channels of the active messages."""
+
+        nc = set()
+        for row in self.active_rows():
+            nc.update(parse_channels(row.channels)[0])
+
+        nc = frozenset(nc)
+        if nc != self._channels:
+            self.channels_changed(nc)
 
     def channels_invalidate(self):
         self._channels = frozenset()
@@ -1723,53 +1989,140 @@ class MessageHandler(GObject.GObject):
         else:
             raise AttributeError("unknown property '{}'".format(prop.name))
 
-    def issue_messages(self, delay_calc=lambda row: 0, forced_message=None):
-        model = self.tree_row_ref.get_model()
-        iter = model.get_iter(self.tree_row_ref.get_path())
-        iter = model.iter_children(iter)
-        while iter is not None:
-            path = model.get_path(iter)
-            if model.path_is_active(path):
-                row = model[path]
-                delay_s = delay_calc(row)
-                if delay_s is not None:
-                    targets = [x.split("!")[0] for x in row.channels.split(",")]
-                    table = [("%%", "%")] + list(zip(self.subst_tokens, (
-                                        self.subst[x] for x in self.subst_keys)))
-                    if forced_message is not None:
-                        message = string_multireplace(forced_message, table)
-                    else:
-                        message = string_multireplace(row.message, table)
-                    self.emit("privmsg-ready", targets, message, delay_s)
+    @classmethod
+    @lru_cache(maxsize=256)
+    def compile_template(cls, message):
+        """Convert a message into a str.format template.
 
-            iter = model.iter_next(iter)
+        Substitutions become positional fields, indices into subst_keys.
+        """
+
+        segments = cls._template_re.split(message)
+        # Even elements are literal text, odd ones the tokens split on.
+        for i in range(0, len(segments), 2):
+            segments[i] = segments[i].replace("{", "{{").replace("}", "}}")
+        for i in range(1, len(segments), 2):
+            segment = cls._token_segments[segments[i]]
+            segments[i] = segment if segment == "%" else "{%d}" % segment
+
+        return "".join(segments)
+
+    def render_template(self, template, values):
+        """Substitute values into a compiled message template."""
+
+        return template.format(*values)
+
+    def render_message(self, message):
+        """The message with substitutions made, cached per metadata update."""
+
+        # Plain text needs no substitution, which is every token's lead-in.
+        if "%" not in message:
+            return message
+
+        if self._rendered_version != self.subst_version:
+            self._rendered.clear()
+            self._rendered_version = self.subst_version
+
+        try:
+            return self._rendered[message]
+        except KeyError:
+            rendered = self.render_template(
+                        self.compile_template(message), self.subst_values)
+            self._rendered[message] = rendered
+            return rendered
+
+    def issue_messages(self, delay_calc=zero_delay, forced_message=None):
+        always_zero = delay_calc is zero_delay
+        if forced_message is not None:
+            forced_message = self.render_message(forced_message)
+        batch = []
+        for row in self.active_rows():
+            delay_s = 0 if always_zero else delay_calc(row)
+            if delay_s is not None:
+                targets = parse_channels(row.channels)[1]
+                if forced_message is None:
+                    message = self.render_message(row.message)
+                else:
+                    message = forced_message
+                batch.append((targets, message, delay_s))
+
+        if batch:
+            self.emit("privmsg-batch-ready", batch)
 
 
 class MessageHandlerForType_3(MessageHandler):
+    _delay_calc = staticmethod(attrgetter("delay"))
+
     def on_new_metadata(self):
         if self.stream_active:
-            self.issue_messages(lambda row: row.delay)
+            self.issue_messages(self._delay_calc)
 
 
 class MessageHandlerForType_5(MessageHandler):
     def __init__(self, *args, **kwargs):
         self._timeout_id = None
+        # When the pending timeout is due to wake.
+        self._due = None
         MessageHandler.__init__(self, *args, **kwargs)
         if self.stream_active:
             self.on_stream_active()
 
     def on_stream_active(self):
-        self._timeout_id = timeout_add(500, self._timeout)
+        self._schedule()
 
     def on_stream_inactive(self):
+        self._unschedule()
+
+    def row_state(self, row):
+        return row.channels, row.offset, row.interval, row.issue
+
+    def channels_reevaluate(self):
+        # Any message row change may alter when the next one is due.
+        MessageHandler.channels_reevaluate(self)
+        if self.stream_active:
+            self._schedule()
+
+    def _schedule(self):
+        """Set the timeout to wake when the next message is due."""
+
+        now = time.time()
+        wait = self._next_due(now)
+        due = None if wait is None else round(now + wait, 3)
+        # Row edits mostly leave the next due time alone.
+        if self._timeout_id is not None and due == self._due:
+            return
+
+        self._unschedule()
+        self._due = due
+        if wait is not None:
+            self._timeout_id = timeout_add(int(wait * 1000) + 1, self._timeout)
+
+    def _unschedule(self):
         if self._timeout_id is not None:
             source_remove(self._timeout_id)
             self._timeout_id = None
 
+    def _next_due(self, now):
+        """Seconds until the next message is due or None if none are."""
+
+        the_time = int(now)
+        wait = None
+        for row in self.active_rows():
+            issue = (the_time - row.offset) // row.interval
+            if issue > int(row.issue or 0):
+                return 0
+            row_wait = row.offset + (issue + 1) * row.interval - now
+            if wait is None or row_wait < wait:
+                wait = row_wait
+
+        return wait
+
     def _timeout(self):
+        self._timeout_id = None
         self.issue_messages(partial(self._delay_calc,
                                                 the_time=int(time.time())))
-        return True
+        self._schedule()
+        return False
 
     def _delay_calc(self, row, the_time):
         """Returns either a delay of 0 or suppression value None."""
@@ -1780,8 +2133,7 @@ class MessageHandlerForType_5(MessageHandler):
             return 0
 
     def cleanup(self):
-        if self._timeout_id is not None:
-            source_remove(self._timeout_id)
+        self._unschedule()
 
 
 class MessageHandlerForType_7(MessageHandler):
@@ -1800,3 +2152,13 @@ class MessageHandlerForType_11(MessageHandler):
 
     def on_stream_inactive(self):
         self.issue_messages(forced_message="!handover dropped %U")
+
+
+# Message handler classes keyed by the message row type they handle.
+MESSAGE_HANDLERS = {
+    3: MessageHandlerForType_3,
+    5: MessageHandlerForType_5,
+    7: MessageHandlerForType_7,
+    9: MessageHandlerForType_9,
+    11: MessageHandlerForType_11
+}
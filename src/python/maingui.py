@@ -30,9 +30,11 @@ import gettext
 import itertools
 import collections
 import json
+import re
 import uuid
 import ctypes
 from binascii import hexlify, unhexlify
+from functools import lru_cache
 
 import dbus
 import dbus.service
@@ -71,9 +73,97 @@ link_uuid_reg = LinkUUIDRegistry()
 
 METER_TEXT_SIZE = 8000
 
+# A portread reply entry: "@" for a connected port or "-" otherwise, then
+# the port name in hex.
+PORTS_REPLY_RE = re.compile(r"([@-])([0-9a-fA-F]+)")
+
+# The hex form of the system playback port names.
+SYSTEM_PLAYBACK_HEX = str(hexlify(b"system:playback_"), "ascii")
+
+
+# The default JACK connections. {client_id} stands for our JACK client name.
+DEFAULT_JACK_CONS = (
+    ("{client_id}:pl_out_l", ("{client_id}:pl_in_l",)),
+    ("{client_id}:pl_out_r", ("{client_id}:pl_in_r",)),
+    ("{client_id}:pr_out_l", ("{client_id}:pr_in_l",)),
+    ("{client_id}:pr_out_r", ("{client_id}:pr_in_r",)),
+    ("{client_id}:pi_out_l", ("{client_id}:pi_in_l",)),
+    ("{client_id}:pi_out_r", ("{client_id}:pi_in_r",)),
+    ("{client_id}:pe01-12_out_l", ("{client_id}:pe_in_l",)),
+    ("{client_id}:pe01-12_out_r", ("{client_id}:pe_in_r",)),
+    ("{client_id}:pe13-24_out_l", ("{client_id}:pe_in_l",)),
+    ("{client_id}:pe13-24_out_r", ("{client_id}:pe_in_r",)),
+    ("{client_id}:ch_in_1", ("system:capture_1",)),
+    ("{client_id}:ch_in_2", ("system:capture_2",)),
+    ("{client_id}:dj_out_l", ("system:playback_1",)),
+    ("{client_id}:dj_out_r", ("system:playback_2",)),
+    ("{client_id}:alarm_out", ("system:playback_1", "system:playback_2")),
+    ("{client_id}:output_in_l", ("{client_id}:str_out_l",)),
+    ("{client_id}:output_in_r", ("{client_id}:str_out_r",)))
+
+# The default stream connections for fewer than eight playback ports.
+DEFAULT_STREAM_CONS_FEW = (
+    ("{client_id}:str_out_l", ("system:playback_3", "{client_id}:output_in_l")),
+    ("{client_id}:str_out_r", ("system:playback_4", "{client_id}:output_in_r")))
+
+# The default stream connections for eight or more playback ports.
+DEFAULT_STREAM_CONS_MANY = (
+    ("{client_id}:str_out_l", ("system:playback_5", "{client_id}:output_in_l")),
+    ("{client_id}:str_out_r", ("system:playback_6", "{client_id}:output_in_r")))
+
+
+# Our own JACK ports, in menu order. The channel inputs depend on the build.
+PLAYER_PORTS = tuple(player + side for player in ("pl", "pr", "pi")
+                     for side in ("_out_l", "_out_r", "_in_l", "_in_r")) + \
+               tuple(player + side for player in ("pe01-12", "pe13-24")
+                     for side in ("_out_l", "_out_r")) + ("pe_in_l", "pe_in_r")
+VOIP_PORTS = ("voip_out_l", "voip_out_r", "voip_in_l", "voip_in_r")
+DSP_PORTS = ("dsp_out_l", "dsp_out_r", "dsp_in_l", "dsp_in_r")
+MIX_PORTS = ("dj_out_l", "dj_out_r", "str_out_l", "str_out_r")
+OUTPUT_PORTS = ("output_in_l", "output_in_r")
+OTHER_PORTS = ("midi_control", "alarm_out")
+
+
+@lru_cache(maxsize=1024)
+def decode_port_name(hex_name):
+    """A JACK port name from the backend's hex encoding of it."""
+
+    return str(unhexlify(hex_name), "ascii")
+
+
+# Helper programs not yet reaped.
+_spawned = set()
+
+
+def spawn_detached(args):
+    """Start a helper program without waiting on it or sharing our stdio.
+
+    The main loop reaps it on exit.
+    """
+
+    try:
+        proc = subprocess.Popen(args, stdin=subprocess.DEVNULL,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+    except OSError:
+        return
+
+    _spawned.add(proc)
+    GLib.child_watch_add(GLib.PRIORITY_DEFAULT, proc.pid, _on_spawned_exit,
+                                                                        proc)
+
+
+def _on_spawned_exit(pid, status, proc):
+    # GLib has collected the exit status. poll() lets Popen know so it
+    # doesn't queue the process for reaping itself.
+    proc.poll()
+    _spawned.discard(proc)
+
 
 class FreewheelButton(Gtk.Button):
     LED = LEDDict(9)
+    # Indexed by freewheel mode.
+    _led_pixbufs = (LED["clear"], LED["red"])
 
     def __init__(self, mixer_write):
         Gtk.Button.__init__(self)
@@ -125,30 +215,33 @@ class FreewheelButton(Gtk.Button):
 
         if active != self._active:
             self._active = active
-            self._indicator.set_from_pixbuf(self.LED["red" if active else "clear"])
+            self._indicator.set_from_pixbuf(self._led_pixbufs[bool(active)])
 
 
 class MenuMixin(object):
-    def build(self, menu, autowipe=False, use_underline=True):
-        def mkitems(x, how=Gtk.MenuItem):
-            for name, text in x:
-                if how in (Gtk.MenuItem, Gtk.CheckMenuItem):
-                    mi = how.new_with_label(text)
-                elif how == StockMenuItem:
-                    mi = Gtk.ImageMenuItem.new_from_stock(text, None)
-                mi.set_use_underline(use_underline)
-                menu.append(mi)
-                mi.show()
-                setattr(self, name + "menu_i", mi)
-                if autowipe:
-                    mi.connect("activate", self.cb_autowipe)
-
-                if issubclass(how, Gtk.CheckMenuItem) and use_underline == True:
-                    a = Gtk.ToggleAction(label=text)
-                    mi.set_related_action(a)
-                    setattr(self, name + "menu_a", a)
+    def build_items(self, menu, items, how=Gtk.MenuItem, autowipe=False,
+                                                        use_underline=True):
+        """Append (name, text) items to menu as attributes name + 'menu_i'."""
 
-        return mkitems
+        if how == StockMenuItem:
+            new_item = lambda text: Gtk.ImageMenuItem.new_from_stock(text, None)
+        else:
+            new_item = how.new_with_label
+        toggle_action = issubclass(how, Gtk.CheckMenuItem) and use_underline
+
+        for name, text in items:
+            mi = new_item(text)
+            mi.set_use_underline(use_underline)
+            menu.append(mi)
+            mi.show()
+            setattr(self, f"{name}menu_i", mi)
+            if autowipe:
+                mi.connect("activate", self.cb_autowipe)
+
+            if toggle_action:
+                a = Gtk.ToggleAction(label=text)
+                mi.set_related_action(a)
+                setattr(self, f"{name}menu_a", a)
 
     def submenu(self, mi, name):
         m = Gtk.Menu()
@@ -174,26 +267,27 @@ class MainMenu(Gtk.MenuBar, MenuMixin):
     def __init__(self):
         Gtk.MenuBar.__init__(self)
 
-        self.build(self)((("file", _('File')), ("view", _('View')),
+        self.build_items(self, (("file", _('File')), ("view", _('View')),
                                 ("jack", _('JACK Ports')), ("help", _('Help'))))
         self.submenu(self.filemenu_i, "file")
-        self.build(self.filemenu, autowipe=True)((("streams", _('Streams')),
-                                ("recorders", _('Recorders'))))
+        self.build_items(self.filemenu, (("streams", _('Streams')),
+                                ("recorders", _('Recorders'))), autowipe=True)
 
         self.sep(self.filemenu)
-        self.build(self.filemenu)((("quit", _("Quit")),))
+        self.build_items(self.filemenu, (("quit", _("Quit")),))
 
         for each in ("streams", "recorders"):
             mi = getattr(self, each + "menu_i")
             m = self.submenu(mi, each)
 
         self.submenu(self.viewmenu_i, "view")
-        mkitems = self.build(self.viewmenu)
-        mkitems(zip("output prefs profiles effects".split(" "),
+        self.build_items(self.viewmenu, zip(
+                "output prefs profiles effects".split(" "),
                 (_('Output'), _('Preferences'), _('Profiles'),
                  _('Effects (windowed)'))))
         self.sep(self.viewmenu)
-        mkitems(zip("songdb chmeters strmeters players buttonbar".split(" "),
+        self.build_items(self.viewmenu, zip(
+                "songdb chmeters strmeters players buttonbar".split(" "),
                 (_('Music Database'), _('Channel Meters'), _('Output Meters'),
                  _('Tabbed Area'), _('Button Bar'))), Gtk.CheckMenuItem)
 
@@ -203,12 +297,12 @@ class MainMenu(Gtk.MenuBar, MenuMixin):
         self.submenu(self.jackmenu_i, "jack")
 
         self.submenu(self.helpmenu_i, "help")
-        self.build(self.helpmenu)((("about", _("About")),))
+        self.build_items(self.helpmenu, (("about", _("About")),))
 
         self.sep(self.helpmenu)
-        self.build(self.helpmenu)((("homepage",_("Homepage")),
-                                   ("host", _("Report Bugs"))
-                                   ))
+        self.build_items(self.helpmenu, (("homepage",_("Homepage")),
+                                         ("host", _("Report Bugs"))
+                                         ))
 
         self.filemenu_i.connect("activate", self.cb_filemenu_activate)
         self.homepagemenu_i.connect("activate", self.cb_homepage)
@@ -219,10 +313,10 @@ class MainMenu(Gtk.MenuBar, MenuMixin):
         self.recordersmenu_i.emit("activate")
 
     def cb_homepage(self, _):
-        os.system("xdg-open https://idjc.sourceforge.io")
+        spawn_detached(["xdg-open", "https://idjc.sourceforge.io"])
 
     def cb_host(self, _):
-        os.system("xdg-open https://sourceforge.net/projects/idjc")
+        spawn_detached(["xdg-open", "https://sourceforge.net/projects/idjc"])
 
 
 class JackMenu(MenuMixin):
@@ -230,7 +324,15 @@ class JackMenu(MenuMixin):
         self.menu = menu
         self.write = write
         self.read = read
+        # Our JACK client name, fixed for the session.
+        self._client_id = os.environ["client_id"]
         self.ports = []
+        # Port submenu items by port and then by destination port name.
+        self._port_items = {}
+        # The portread filter for each port, which finds its possible peers.
+        self._port_filter = {}
+        # Ports whose submenu was filled by select and not yet activated.
+        self._port_fresh = set()
         self.pathname = pm.ports_pathname
         self.session_type = pm.session_type
 
@@ -238,8 +340,7 @@ class JackMenu(MenuMixin):
         #
         # member really exists, was created by setattr
 
-        mkitems = self.build(menu.jackmenu)
-        mkitems(zip(
+        self.build_items(menu.jackmenu, zip(
                     "channels players voip dsp mix output other".split(), (
                     _('Channels'), _('Players'),
                     _('VoIP'), _('DSP'), _('Mix'), _('Output'), _('Misc'))))
@@ -251,43 +352,25 @@ class JackMenu(MenuMixin):
         self.submenu(self.outputmenu_i, "output")
         self.submenu(self.othermenu_i, "other")
 
-        out2_in2 = itertools.cycle(("_out_",)*2 + ("_in_",)*2)
-        out2_in1 = itertools.cycle(("_out_",)*2 + ("_in_",)*1)
-        lr = itertools.cycle("lr")
-        dj2_str2 = itertools.cycle(("dj",)*2 + ("str",)*2)
-
-        for prefix in "pl pr pi".split():
-            for each in zip((prefix,) * 4, out2_in2, lr):
-                self.add_port(self.playersmenu, "".join(each))
-
-        for prefix in "pe01-12 pe13-24".split():
-            for each in zip((prefix,) * 2, ("_out_", ) * 2, lr):
-                self.add_port(self.playersmenu, "".join(each))
-        for each in zip(("pe_in_", ) * 2, lr):
-            self.add_port(self.playersmenu, "".join(each))
-
-        for each in zip(("voip",) * 4, out2_in2, lr):
-            self.add_port(self.voipmenu, "".join(each))
-
-        for each in zip(("dsp",) * 4, out2_in2, lr):
-            self.add_port(self.dspmenu, "".join(each))
-
-        for each in zip(dj2_str2, ("_out_",)*4, lr):
-            self.add_port(self.mixmenu, "".join(each))
-
+        for port in PLAYER_PORTS:
+            self.add_port(self.playersmenu, port)
+        for port in VOIP_PORTS:
+            self.add_port(self.voipmenu, port)
+        for port in DSP_PORTS:
+            self.add_port(self.dspmenu, port)
+        for port in MIX_PORTS:
+            self.add_port(self.mixmenu, port)
         for i in range(1, PGlobs.num_micpairs * 2 + 1):
             self.add_port(self.channelsmenu, "ch_in_" + str(i))
-
-        for each in zip(("output_in_",) * 2, lr):
-            self.add_port(self.outputmenu, "".join(each))
-
-        self.add_port(self.othermenu, "midi_control")
-        self.add_port(self.othermenu, "alarm_out")
+        for port in OUTPUT_PORTS:
+            self.add_port(self.outputmenu, port)
+        for port in OTHER_PORTS:
+            self.add_port(self.othermenu, port)
 
         self._port_data = []
 
         self.sep(menu.jackmenu)
-        mkitems((("reset", _('Reset')),))
+        self.build_items(menu.jackmenu, (("reset", _('Reset')),))
         self.resetmenu_i.connect("activate", self._reset_confirm_dialog)
         set_tip(self.resetmenu_i,
                 _('Reset the JACK port connections to the default settings.'))
@@ -308,44 +391,93 @@ class JackMenu(MenuMixin):
         self.load(where="")
 
     def add_port(self, menu, port):
-        pport = os.environ["client_id"] + ":" + port
+        pport = f"{self._client_id}:{port}"
         self.ports.append(pport)
-        self.build(menu, autowipe=True, use_underline=False)(((port, pport),))
-        mi = getattr(self, port + "menu_i")
-        sub = self.submenu(mi, port)
-        mi.connect("activate", self.cb_port_connections, pport, sub)
-        mi.emit("activate")
-
-    def cb_port_connections(self, mi, port, menu):
-        reply = ""
-
         if "_in_" in port or port.endswith("_in"):
-            filter_ = "outputs"
+            self._port_filter[pport] = "outputs"
         elif "_out_" in port or port.endswith("_out"):
-            filter_ = "inputs"
+            self._port_filter[pport] = "inputs"
         elif "midi" in port:
-            filter_ = "midioutputs"
+            self._port_filter[pport] = "midioutputs"
+        self.build_items(menu, ((port, pport),), use_underline=False)
+        mi = getattr(self, port + "menu_i")
+        sub = self.submenu(mi, port)
+        mi.connect("activate", self.cb_port_activate, pport, sub)
+        # Connections are read when the submenu is first shown, not at startup.
+        mi.connect("select", self.cb_port_select, pport, sub)
+        mi.connect("deselect", self.cb_port_deselect, pport)
+
+    def cb_port_select(self, mi, port, menu):
+        if not menu.get_children():
+            self.cb_port_connections(mi, port, menu)
+            self._port_fresh.add(port)
+
+    def cb_port_deselect(self, mi, port):
+        self._port_fresh.discard(port)
+
+    def cb_port_activate(self, mi, port, menu):
+        # The activate that follows a first select would read them again.
+        if port in self._port_fresh:
+            self._port_fresh.discard(port)
         else:
+            self.cb_port_connections(mi, port, menu)
+
+    def cb_port_connections(self, mi, port, menu):
+        try:
+            filter_ = self._port_filter[port]
+        except KeyError:
             print("JackMenu.port_connections: unknown port type")
             return
 
         self.write("portread", "JFIL=%s\nJPRT=%s\nend\n" % (filter_, port))
-        while not reply.startswith("jackports="):
+        reply = self._read_ports_reply()
+
+        # The submenu is brought up to date rather than rebuilt.
+        # Destination port names map to connection state. None stands for
+        # the item shown when there are no ports.
+        listed = {decode_port_name(hex_name): flag == "@"
+                  for flag, hex_name in reply}
+        if not listed:
+            listed[None] = False
+        items = self._port_items.setdefault(port, {})
+        for name in items.keys() - listed.keys():
+            items.pop(name).destroy()
+
+        for position, (name, active) in enumerate(listed.items()):
+            try:
+                mi = items[name]
+            except KeyError:
+                if name is None:
+                    mi = Gtk.MenuItem.new_with_label(
+                                        _('No compatible ports available.'))
+                    mi.set_sensitive(False)
+                else:
+                    mi = Gtk.CheckMenuItem.new_with_label(name)
+                    mi.set_active(active)
+                    mi.connect("activate", self.cb_activate, port, name)
+                items[name] = mi
+                menu.insert(mi, position)
+                mi.show()
+            else:
+                if name is not None and mi.get_active() != active:
+                    # Setting the state would otherwise emit activate.
+                    mi.handler_block_by_func(self.cb_activate)
+                    mi.set_active(active)
+                    mi.handler_unblock_by_func(self.cb_activate)
+
+    def _read_ports_reply(self):
+        """The (flag, hex name) port pairs of the next portread reply.
+
+        Other lines are skipped. An empty list is returned if the backend
+        stops responding.
+        """
+
+        reply = None
+        while reply != "":
             reply = self.read()
-        reply = reply[10:].rstrip().split()
-        if not reply:
-            self.build(menu)((("noports",
-                                        _('No compatible ports available.')),))
-            self.noportsmenu_i.set_sensitive(False)
-        else:
-            for destport in reply:
-                self.build(menu, use_underline=False)(
-                (("targetport", str(unhexlify(destport[1:]), "ascii")),), how=Gtk.CheckMenuItem)
-                mi = getattr(self, "targetportmenu_i")
-                if destport.startswith("@"):
-                    mi.set_active(True)
-                mi.connect(
-                    "activate", self.cb_activate, port, str(unhexlify(destport[1:]), "ascii"))
+            if reply.startswith("jackports="):
+                return PORTS_REPLY_RE.findall(reply, 10)
+        return []
 
     def cb_activate(self, mi, local, dest):
         cmd = "connect" if mi.get_active() else "disconnect"
@@ -354,13 +486,8 @@ class JackMenu(MenuMixin):
 
     def get_playback_port_qty(self):
         self.write("portread", "JFIL=\nJPRT=\nend\n")
-        reply = ""
-        while not reply.startswith("jackports="):
-            reply = self.read()
-
-        match = "-" + str(hexlify(b"system:playback_"), "ascii")
-        pbports = [x for x in reply[10:-1].split() if x.startswith(match)]
-        return len(pbports)
+        return sum(1 for flag, hex_name in self._read_ports_reply()
+                   if flag == "-" and hex_name.startswith(SYSTEM_PLAYBACK_HEX))
 
 
     def standard_save(self):
@@ -381,33 +508,40 @@ class JackMenu(MenuMixin):
             arg = _("{0} session={1}:{2} settings saved.").format(
                     PGlobs.app_shortform, self.session_type, pm.session_name)
 
-        try:
-            subprocess.call(["notify-send", arg])
-        except OSError:
-            pass
+        spawn_detached(["notify-send", arg])
 
     def _get_port_data(self):
-        total = []
+        # All the requests go out before any reply is read so the wait is
+        # for one round trip rather than one per port.
         for port in self.ports:
-            element = [port]
             self.write("portread", "JFIL=\nJPRT=%s\nend\n" % port)
-            reply = ""
-            while not reply.startswith("jackports="):
-                reply = self.read()
 
-            element.append([str(unhexlify(x.lstrip("@-")), "ascii")
-                           for x in reply[10:-1].split()
-                           if x.startswith("@")])
+        total = []
+        for port in self.ports:
+            element = [port]
+            element.append([decode_port_name(hex_name)
+                           for flag, hex_name in self._read_ports_reply()
+                           if flag == "@"])
             total.append(element)
         return total
 
     def _save(self, data, where=None):
         if where is not None:
             where = os.path.join(where, os.path.split(self.pathname)[1])
-        client_id = "\"%s:" % os.environ["client_id"]
+        # Own ports are stored client-neutral so the file survives a rename.
+        prefix = self._client_id + ":"
+        cut = len(prefix)
+
+        def neutral(port):
+            if port.startswith(prefix):
+                return "{client_id}:" + port[cut:]
+            return port
+
+        data = [[neutral(port), [neutral(x) for x in targets]]
+                for port, targets in data]
         try:
             with open(where or self.pathname, "w") as f:
-                f.write(json.dumps(data).replace(client_id, "\"{client_id}:"))
+                json.dump(data, f)
         except Exception as e:
             print("problem writing", self.pathname)
         else:
@@ -424,46 +558,28 @@ class JackMenu(MenuMixin):
             if args.no_default_jack_connections:
                 cons = []
             else:
-                cons = """[
-                    ["{client_id}:pl_out_l", ["{client_id}:pl_in_l"]],
-                    ["{client_id}:pl_out_r", ["{client_id}:pl_in_r"]],
-                    ["{client_id}:pr_out_l", ["{client_id}:pr_in_l"]],
-                    ["{client_id}:pr_out_r", ["{client_id}:pr_in_r"]],
-                    ["{client_id}:pi_out_l", ["{client_id}:pi_in_l"]],
-                    ["{client_id}:pi_out_r", ["{client_id}:pi_in_r"]],
-                    ["{client_id}:pe01-12_out_l", ["{client_id}:pe_in_l"]],
-                    ["{client_id}:pe01-12_out_r", ["{client_id}:pe_in_r"]],
-                    ["{client_id}:pe13-24_out_l", ["{client_id}:pe_in_l"]],
-                    ["{client_id}:pe13-24_out_r", ["{client_id}:pe_in_r"]],
-                    ["{client_id}:ch_in_1", ["system:capture_1"]],
-                    ["{client_id}:ch_in_2", ["system:capture_2"]],
-                    ["{client_id}:dj_out_l", ["system:playback_1"]],
-                    ["{client_id}:dj_out_r", ["system:playback_2"]],
-                    ["{client_id}:alarm_out", ["system:playback_1", "system:playback_2"]],
-                    ["{client_id}:output_in_l", ["{client_id}:str_out_l"]],
-                    ["{client_id}:output_in_r", ["{client_id}:str_out_r"]], """
-
-                if self.get_playback_port_qty() < 8:
-                    cons += """
-                    ["{client_id}:str_out_l",
-                        ["system:playback_3", "{client_id}:output_in_l"]],
-                    ["{client_id}:str_out_r",
-                        ["system:playback_4", "{client_id}:output_in_r"]]] """
-                else:
-                    cons += """
-                    ["{client_id}:str_out_l",
-                        ["system:playback_5", "{client_id}:output_in_l"]],
-                    ["{client_id}:str_out_r",
-                        ["system:playback_6", "{client_id}:output_in_r"]]] """
+                cons = self._default_connections()
+        else:
+            try:
+                cons = json.loads(cons.format(client_id=self._client_id))
+            except ValueError:
+                print("jack port connections file is empty")
+                return
 
-        try:
-            cons = json.loads(cons.format(client_id=os.environ["client_id"]))
-        except ValueError:
-            print("jack port connections file is empty")
+        self._port_data = cons
+        if not startup or not args.no_jack_connections:
+            self.restore(cons)
+
+    def _default_connections(self):
+        if self.get_playback_port_qty() < 8:
+            cons = DEFAULT_JACK_CONS + DEFAULT_STREAM_CONS_FEW
         else:
-            self._port_data = cons
-            if not startup or not args.no_jack_connections:
-                self.restore(cons)
+            cons = DEFAULT_JACK_CONS + DEFAULT_STREAM_CONS_MANY
+
+        client_id = self._client_id
+        return [[port.format(client_id=client_id),
+                 [x.format(client_id=client_id) for x in targets]]
+                for port, targets in cons]
 
     def restore(self, cons=None, restrict=""):
         cons = cons or self._port_data
@@ -512,6 +628,29 @@ class IconChooserButtonExtd(IconChooserButton):
         self.set_filename(filename or None)
 
 
+# (modification time, scaled icon pixbuf) keyed by pathname and size.
+_scaled_icons = {}
+
+
+def load_scaled_icon(pathname, width, height):
+    """A pixbuf of an image file at a size, decoded once per file version."""
+
+    mtime = os.stat(pathname).st_mtime_ns
+    key = (pathname, width, height)
+    try:
+        cached_mtime, pb = _scaled_icons[key]
+    except KeyError:
+        pass
+    else:
+        if cached_mtime == mtime:
+            return pb
+
+    pb = GdkPixbuf.Pixbuf.new_from_file_at_size(pathname, width, height)
+    # An edited file replaces its old pixbuf rather than adding another.
+    _scaled_icons[key] = (mtime, pb)
+    return pb
+
+
 class MicButton(Gtk.ToggleButton):
     @property
     def flash(self):
@@ -571,20 +710,12 @@ class MicButton(Gtk.ToggleButton):
 
         self.ca1 = make_indicator()
 
-        lvbox = Gtk.VBox()
-        hbox.pack_start(lvbox, False)
-
-        self._ident_label = MarkupLabel("", size=METER_TEXT_SIZE)
-        self._ident_label.set_no_show_all(nsa)
-        self._ident_label.props.halign = 0.0
-        self._ident_label.props.valign = 0.0
-        lvbox.pack_start(self._ident_label, False)
-
-        self._chan_label3 = MarkupLabel("", size=METER_TEXT_SIZE)
-        self._chan_label3.set_no_show_all(nsa)
-        self._chan_label3.props.halign = 0.0
-        self._chan_label3.props.valign = 1.0
-        lvbox.pack_end(self._chan_label3, False)
+        # Ident over the third channel group at the left, first and second
+        # channel groups at the right: two labels in all.
+        self._left_label = MarkupLabel("", size=METER_TEXT_SIZE)
+        self._left_label.set_no_show_all(nsa)
+        self._left_label.props.xalign = 0.0
+        hbox.pack_start(self._left_label, False)
 
         pad = Gtk.HBox()
         hbox.pack_start(pad)
@@ -598,8 +729,8 @@ class MicButton(Gtk.ToggleButton):
         self._icon_image = Gtk.Image()
         icon = opener_tab.icb.get_filename()
         try:
-            pb = GdkPixbuf.Pixbuf.new_from_file_at_size(icon, 47, 20)
-        except (TypeError, GLib.GError):
+            pb = load_scaled_icon(icon, 47, 20)
+        except (TypeError, OSError, GLib.GError):
             pass
         else:
             self._icon_image.set_from_pixbuf(pb)
@@ -608,20 +739,11 @@ class MicButton(Gtk.ToggleButton):
         pad = Gtk.HBox()
         hbox.pack_start(pad)
 
-        rvbox = Gtk.VBox()
-        hbox.pack_start(rvbox, False)
-
-        self._chan_label1 = MarkupLabel("", size=METER_TEXT_SIZE)
-        self._chan_label1.set_no_show_all(nsa)
-        self._chan_label1.halign = 1.0
-        self._chan_label1.valign = 0.0
-        rvbox.pack_start(self._chan_label1, False)
-
-        self._chan_label2 = MarkupLabel("", size=METER_TEXT_SIZE)
-        self._chan_label2.set_no_show_all(nsa)
-        self._chan_label2.props.halign = 1.0
-        self._chan_label2.props.valign = 1.0
-        rvbox.pack_end(self._chan_label2, False)
+        self._right_label = MarkupLabel("", size=METER_TEXT_SIZE)
+        self._right_label.set_no_show_all(nsa)
+        self._right_label.props.xalign = 1.0
+        self._right_label.set_justify(Gtk.Justification.RIGHT)
+        hbox.pack_start(self._right_label, False)
 
         self.ca2 = make_indicator()
 
@@ -632,15 +754,13 @@ class MicButton(Gtk.ToggleButton):
         if to_close:
             to_close = "!" + to_close
 
-        self._ident_label.set_text("(%d)%s" % (opener_tab.ident, to_close))
-
-        def labeltext():
-            for blk in itertools.zip_longest(*(iter(mic_agc_list),) * 4):
-                yield ",".join(x.ui_name for x in blk if x is not None)
-
-        for text, label in zip(labeltext(),
-                    (self._chan_label1, self._chan_label2, self._chan_label3)):
-            label.set_text(text)
+        # Up to four channel names to a line. The first two lines go on the
+        # right and any more go under the ident.
+        names = [x.ui_name for x in mic_agc_list]
+        chans = [",".join(names[i:i + 4]) for i in range(0, len(names), 4)]
+        self._left_label.set_text("\n".join(
+                    ["(%d)%s" % (opener_tab.ident, to_close)] + chans[2:]))
+        self._right_label.set_text("\n".join(chans[:2]))
 
         self.connect("toggled", self.__cb_toggle)
         self.__flash = False
@@ -652,6 +772,20 @@ class OpenerTab(Gtk.VBox):
     __gsignals__ = { "changed" : (
                         GObject.SignalFlags.RUN_LAST, GObject.TYPE_NONE, ())}
 
+    # One icon file chooser serves every tab.
+    _icon_chooser = None
+
+    @classmethod
+    def _get_icon_chooser(cls):
+        if cls._icon_chooser is None:
+            dialog = IconPreviewFileChooserDialog(title="Choose An Icon",
+                                            action=Gtk.FileChooserAction.OPEN)
+            dialog.add_button(_("Clear"), Gtk.ResponseType.NONE)
+            dialog.add_button(_("Cancel"), Gtk.ResponseType.CANCEL)
+            dialog.add_button(_("OK"), Gtk.ResponseType.OK)
+            cls._icon_chooser = dialog
+        return cls._icon_chooser
+
     def __init__(self, ident):
         Gtk.VBox.__init__(self)
         self.set_border_width(6)
@@ -676,12 +810,7 @@ class OpenerTab(Gtk.VBox):
 
         label = Gtk.Label.new(_('Icon'))
         lhbox.pack_start(label, False)
-        self.icon_chooser = IconPreviewFileChooserDialog(title="Choose An Icon",
-                                                         action=Gtk.FileChooserAction.OPEN)
-        self.icon_chooser.add_button(_("Clear"), Gtk.ResponseType.NONE)
-        self.icon_chooser.add_button(_("Cancel"), Gtk.ResponseType.CANCEL)
-        self.icon_chooser.add_button(_("OK"), Gtk.ResponseType.OK)
-        self.icb = IconChooserButtonExtd(self.icon_chooser)
+        self.icb = IconChooserButtonExtd(self._get_icon_chooser())
         set_tip(self.icb, _("The opener button's icon."))
         self.icb.connect("filename-changed", lambda w, r: self.emit("changed"))
         sg.add_widget(self.icb)
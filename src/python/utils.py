@@ -227,6 +227,8 @@ class LinkUUIDRegistry(dict, metaclass=Singleton):
     link_re = re.compile(
                     "\{[a-fA-F0-9]{8}-([a-fA-F0-9]{4}-){3}[a-fA-F0-9]{12}\}")
     link_dir = None
+    # Bumped whenever the links directory is updated.
+    version = 0
 
     def add(self, uuid_, pathname):
         if os.path.exists(pathname):
@@ -290,6 +292,7 @@ class LinkUUIDRegistry(dict, metaclass=Singleton):
         # links directory itself.
         self._purge(where)
         self.link_dir = where
+        self.version += 1
 
     def get_link_filename(self, uuid_):
         """Check in the links directory for a specific UUID filename."""